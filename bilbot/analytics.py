@@ -0,0 +1,179 @@
+"""
+This module stores Bilbot's analytics.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+from array import array
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+TYPECODE = 'q'  # a signed 64-bit integer, just as 'numpy.int64'.
+
+# pylint: disable=invalid-name
+table = namedtuple('table', ['uuids', 'amounts', 'counts', 'names'])
+stat = namedtuple('stat', ['uuid', 'name', 'amount', 'count', 'mean'])
+
+
+# NOTE: NumPy is optional; without it, the very same columns
+# ===== are kept in plain arrays and reduced in pure Python.
+# ===== It's only imported on first use, since it slows down startup.
+
+@lru_cache(maxsize=None)
+def _get_numpy():
+    """
+    Return the 'numpy' module, or None if it isn't installed.
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+# LOADING
+# =======
+
+def load(ledger, ppids):
+    """
+    Load the running totals of some purchase periods into columns,
+    with one row per user and period, plus the latest name of every user.
+
+    Only the precomputed totals of every period are read
+    (never its records), so loading depends on the amount of users.
+
+    >>> load(ledger, ['1', '2'])
+    table(uuids=array([631104, 314225, 631104]),
+          amounts=array([4200, 650, 1200]),
+          counts=array([1, 1, 2]),
+          names={631104: 'Bob', 314225: 'Alice'})
+    """
+
+    uuids, amounts, counts = (array(TYPECODE) for _ in range(3))
+    names = {}
+    for ppid in ppids:
+        for user in ledger.aggregate_period(ppid):
+            uuids.append(user.uuid)
+            amounts.append(user.amount)
+            counts.append(user.count)
+            names[user.uuid] = user.name
+
+    numpy = _get_numpy()
+    if numpy is not None:
+        uuids, amounts, counts = (numpy.array(column, dtype=numpy.int64)
+                                  for column in (uuids, amounts, counts))
+    return table(uuids, amounts, counts, names)
+
+
+# AGGREGATING
+# ===========
+
+def _group_numpy(table_):
+    """
+    Group the rows by user, with batched operations,
+    into columns kept in the order they first appeared.
+    """
+
+    numpy = _get_numpy()
+    keys, firsts, inverse = numpy.unique(table_.uuids,
+                                         return_index=True,
+                                         return_inverse=True)
+    amounts = numpy.zeros(len(keys), dtype=numpy.int64)
+    counts = numpy.zeros(len(keys), dtype=numpy.int64)
+    numpy.add.at(amounts, inverse, table_.amounts)
+    numpy.add.at(counts, inverse, table_.counts)
+
+    order = numpy.argsort(firsts)  # as they first appeared.
+    return keys[order], amounts[order], counts[order]
+
+
+def _aggregate_numpy(table_):
+    """
+    Group the rows by user, with batched operations.
+    """
+
+    return list(zip(*(column.tolist() for column in _group_numpy(table_))))
+
+
+def _aggregate_python(table_):
+    """
+    Group the rows by user, one row at a time.
+    """
+
+    groups = OrderedDict()
+    for uuid, amount, count in zip(table_.uuids,
+                                   table_.amounts,
+                                   table_.counts):
+        total, times = groups.get(uuid, (0, 0))
+        groups[uuid] = (total + amount, times + count)
+    return [(uuid, amount, count)
+            for uuid, (amount, count) in groups.items()]
+
+
+def _to_stats(table_, grouped):
+    return [stat(uuid, table_.names[uuid], amount, count, amount / count)
+            for uuid, amount, count in grouped]
+
+
+def aggregate(table_):
+    """
+    Return the total, count and mean of every user,
+    in the order they first appear.
+
+    >>> aggregate(load(ledger, ['1', '2']))
+    [stat(uuid=631104, name='Bob', amount=5400, count=3, mean=1800.0),
+     stat(uuid=314225, name='Alice', amount=650, count=1, mean=650.0)]
+    """
+
+    if not len(table_.uuids):
+        return []
+
+    grouped = (_aggregate_numpy if _get_numpy() is not None else
+               _aggregate_python)(table_)
+    return _to_stats(table_, grouped)
+
+
+# RANKING
+# =======
+
+def _top_numpy(table_, size):
+    """
+    Rank the users, with a single sort over the grouped amounts.
+    """
+
+    numpy = _get_numpy()
+    keys, amounts, counts = _group_numpy(table_)
+    # NOTE: a stable sort keeps the ties in the order they first appeared.
+    best = numpy.argsort(-amounts, kind='mergesort')[:size]
+    return zip(keys[best].tolist(),
+               amounts[best].tolist(),
+               counts[best].tolist())
+
+
+def _top_python(table_, size):
+    """
+    Rank the users, one row at a time.
+    """
+
+    grouped = _aggregate_python(table_)
+    return sorted(grouped, key=lambda row: -row[1])[:size]
+
+
+def top(table_, size):
+    """
+    Return the 'size' users that withdrew the most, in descending order,
+    breaking the ties by the order they first appear.
+
+    >>> top(load(ledger, ['1', '2']), 1)
+    [stat(uuid=631104, name='Bob', amount=5400, count=3, mean=1800.0)]
+    """
+
+    if not len(table_.uuids):
+        return []
+
+    ranked = (_top_numpy if _get_numpy() is not None else
+              _top_python)(table_, size)
+    return _to_stats(table_, ranked)
@@ -0,0 +1,139 @@
+"""
+This module stores Bilbot's archive of closed purchase periods.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import json
+import os
+import zlib
+
+ENCODING = 'utf-8'
+EXTENSION = '.seg'
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def get_archive_path(filepath):
+    """
+    Return the directory holding the archived periods of a ledger.
+
+    >>> get_archive_path('/data/accounts-42.txt')
+    '/data/accounts-42.archive'
+    """
+
+    root, _ = os.path.splitext(filepath)
+    return '{}.archive'.format(root)
+
+
+def _get_segment_path(directory, ppid):
+    """
+    Return the path of the segment of a purchase period,
+    padded so that segments are sorted by their 'ppid'.
+    Withdrawals made before opening any period go into the zeroth one.
+
+    >>> _get_segment_path('/data/accounts-42.archive', '3')
+    '/data/accounts-42.archive/0000000003.seg'
+    """
+
+    filename = SEGMENT_TEMPLATE.format(ppid=int(ppid or 0),
+                                       extension=EXTENSION)
+    return os.path.join(directory, filename)
+
+
+# SEGMENTS
+# ========
+
+# NOTE: a segment is immutable, and it's made of two parts:
+# ===== [1] a summary, as a single line of JSON (readable on its own);
+#       [2] the lines of the period, compressed with zlib.
+
+def write_segment(directory, ppid, summary, lines):
+    """
+    Store a closed purchase period, atomically and durably.
+
+    >>> write_segment(directory, '2', {'total': 4200, [...]}, lines)
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    segment_path = _get_segment_path(directory, ppid)
+    header = json.dumps(summary, separators=(',', ':')) + '\n'
+    body = zlib.compress(''.join(lines).encode(ENCODING))
+    with open(segment_path + '.tmp', 'wb') as segment:
+        segment.write(header.encode(ENCODING))
+        segment.write(body)
+        segment.flush()
+        os.fsync(segment.fileno())
+    os.replace(segment_path + '.tmp', segment_path)
+
+
+def read_summary(directory, ppid):
+    """
+    Return the summary of an archived period, or None if it isn't one.
+    Only the header is read, so nothing gets decompressed.
+
+    >>> read_summary(directory, '2')
+    {'total': 4200, 'count': 1, 'users': {'631104': ['Bob', 4200, 1]}}
+    """
+
+    try:
+        with open(_get_segment_path(directory, ppid), 'rb') as segment:
+            return json.loads(segment.readline().decode(ENCODING))
+    except FileNotFoundError:
+        return None
+
+
+def read_lines(directory, ppid):
+    """
+    Return the lines of an archived period.
+
+    >>> read_lines(directory, '2')
+    ['2=\n', '2;631104;Bob;4200\n']
+    """
+
+    with open(_get_segment_path(directory, ppid), 'rb') as segment:
+        segment.readline()
+        text = zlib.decompress(segment.read()).decode(ENCODING)
+    return text.splitlines(keepends=True)
+
+
+def get_ppids(directory):
+    """
+    Return the 'ppid' of every archived period, in order.
+
+    >>> get_ppids(directory)
+    ['', '1', '2']
+    """
+
+    try:
+        filenames = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    return [str(int(filename[:-len(EXTENSION)]) or '')
+            for filename in filenames if filename.endswith(EXTENSION)]
+
+
+def remove_segment(directory, ppid):
+    """
+    Remove the segment of an archived period.
+    """
+
+    os.remove(_get_segment_path(directory, ppid))
+
+
+def clear(directory):
+    """
+    Remove every archived period.
+    """
+
+    for filename in os.listdir(directory) if os.path.isdir(directory) else []:
+        os.remove(os.path.join(directory, filename))
+
+
+# TEMPLATES
+# =========
+
+SEGMENT_TEMPLATE = "{ppid:010d}{extension}"
@@ -0,0 +1,299 @@
+"""
+This module stores Bilbot's benchmarks.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+
+The commands are run against synthetic ledgers of increasing size,
+without any network, and the results are saved as JSON with...
+$ python3 bilbot/benchmark.py --sizes 1000 100000 --output results.json
+
+The startup (i.e. a fresh interpreter importing Bilbot) is measured with...
+$ python3 bilbot/benchmark.py --startup
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import commands
+import csvarchive
+import csvledger
+import csvrows
+import csvtail
+import router
+import settings
+
+from telegram.update import Update
+
+SIZES = [10 ** exponent for exponent in range(3, 8)]
+RUNS = 100
+PERIOD_LENGTH = 1000  # the average amount of records per period.
+USERS = 50
+PERCENTILES = (50, 90, 99)
+SCENARIOS = ('list', 'list_agg', 'withdraw', 'new', 'rollback',
+             'get_last_line')
+LEDGER_NAME = 'accounts.txt'
+
+# the very same routes that the bot uses.
+ROUTES = router.get_routes(commands.COMMANDS)
+FALLBACK = router.get_routes({'unknown': commands.unknown})['unknown']
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def generate(filepath, size, seed=0):
+    """
+    Write a synthetic ledger with 'size' records, spread over
+    many periods (roughly one boundary every PERIOD_LENGTH records)
+    and withdrawn by USERS different users.
+
+    Its closed periods are then archived, just as '/new' would have done,
+    so only the open one is left in the ledger itself.
+
+    >>> generate('/tmp/accounts.txt', 1000)
+    """
+
+    rand = random.Random(seed)
+    names = ['User{}'.format(uuid) for uuid in range(USERS)]
+    ppid = 0
+    with open(filepath, 'w', encoding=csvrows.ENCODING) as ledger_file:
+        writer = csv.writer(ledger_file, **settings.CSV_KWARGS)
+        for number in range(size):
+            if number % PERIOD_LENGTH == 0:
+                ppid += 1
+                ledger_file.write(csvrows.format_boundary(ppid))
+                continue
+            uuid = rand.randrange(USERS)
+            amount = rand.randrange(1, 200) * 100
+            writer.writerow([ppid, uuid, names[uuid], amount])
+
+    ledger = csvledger.CSVLedger(filepath)
+    with ledger.committer.locked():
+        csvarchive.compact(filepath, ledger.journal)
+    csvtail.forget(filepath)
+
+
+def _percentile(values, percent):
+    """
+    Return a percentile of some values, using the nearest rank.
+
+    >>> _percentile([1, 2, 3, 4], 50)
+    2
+    """
+
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100 * len(ordered))), 1)
+    return ordered[rank - 1]
+
+
+# FAKE UPDATES
+# ==== =======
+
+class _NullOutbox:
+    """
+    Swallow every reply, so nothing ever reaches the network.
+    """
+
+    @staticmethod
+    def put(bot, chat_id, text, **kwargs):
+        pass
+
+
+def _use_ledger(ledger):
+    """
+    Make every update use the given ledger,
+    instead of the one stored for its chat.
+    """
+
+    Update.ledger = property(lambda update: ledger)
+
+
+def _make_update(text, chat_id, update_id):
+    """
+    Build an update, as Telegram would have delivered it.
+
+    >>> _make_update('/list agg', -1337, 1).message.text
+    '/list agg'
+    """
+
+    payload = {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'text': text,
+            'chat': {'id': chat_id, 'type': 'group', 'title': 'Benchmark'},
+            'from': {'id': 7, 'first_name': 'Alice'},
+        },
+    }
+    return Update.de_json(payload, None)
+
+
+def _run_command(text, chat_id, update_id=0):
+    """
+    Run a (decorated) command for a text, and return its duration.
+    """
+
+    name, _, args = router.parse(text)
+    route = ROUTES.get(name, FALLBACK)
+    kwargs = {'args': args} if route.pass_args else {}
+
+    update = _make_update(text, chat_id, update_id)
+    start = time.perf_counter()
+    route.callback(None, update, **kwargs)
+    return time.perf_counter() - start
+
+
+# BENCHMARKS
+# ==========
+
+def _get_scenarios(filepath, chat_id, amount):
+    """
+    Return every benchmarked operation, along with the one undoing it,
+    so that the ledger keeps its size from one run to the next.
+    """
+
+    run = lambda text: lambda: _run_command(text, chat_id)
+    last_line = lambda: _measure(csvtail.get_last_line, filepath)
+    return {
+        'list': (run('/list'), None),
+        'list_agg': (run('/list agg'), None),
+        'withdraw': (run('/withdraw {}'.format(amount)), run('/rollback')),
+        'new': (run('/new'), run('/rollback')),
+        'rollback': (run('/rollback'), run('/withdraw {}'.format(amount))),
+        'get_last_line': (last_line, None),
+    }
+
+
+def _measure(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def bench(scenario, runs):
+    """
+    Run a scenario many times, returning its latency percentiles
+    (in milliseconds), the latency of the first (i.e. cold) run,
+    and its peak of allocated memory (in bytes).
+    """
+
+    operation, undo = scenario
+    cold = operation()
+    if undo: undo()
+
+    latencies = []
+    for _ in range(runs):
+        latencies.append(operation())
+        if undo: undo()
+
+    # NOTE: memory is traced on a separate run,
+    # ===== since tracing slows down every allocation.
+    tracemalloc.start()
+    operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if undo: undo()
+
+    result = {'cold_ms': cold * 1000, 'peak_bytes': peak}
+    for percent in PERCENTILES:
+        key = 'p{}_ms'.format(percent)
+        result[key] = _percentile(latencies, percent) * 1000
+    return result
+
+
+def startup(runs):
+    """
+    Import Bilbot in a fresh interpreter many times (just as a restart
+    would, but without polling), returning its latency percentiles
+    (in milliseconds), along with the latency of the first run.
+    """
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    launch = [sys.executable, '-c', 'import bilbot']
+    run = lambda: _measure(subprocess.check_call, launch, cwd=directory)
+
+    cold = run()
+    latencies = [run() for _ in range(runs)]
+    result = {'command': 'startup', 'runs': runs, 'cold_ms': cold * 1000}
+    for percent in PERCENTILES:
+        key = 'p{}_ms'.format(percent)
+        result[key] = _percentile(latencies, percent) * 1000
+    return result
+
+
+def run_all(sizes, runs, output):
+    """
+    Benchmark every scenario against a ledger of every size,
+    and save the results into a JSON file.
+    """
+
+    config = settings.get_snapshot()
+    chat_id = int(min(config.whitelist)) if config.whitelist else -1337
+    commands.OUTBOX = _NullOutbox()
+
+    results = []
+    directory = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            pristine = os.path.join(directory, str(size), 'pristine')
+            os.makedirs(pristine)
+            generate(os.path.join(pristine, LEDGER_NAME), size)
+
+            # NOTE: every scenario gets its own copy of the ledger
+            # ===== (and its archive), since '/new' compacts it for good.
+            for name in SCENARIOS:
+                copy = shutil.copytree(pristine,
+                                       os.path.join(directory, str(size),
+                                                    name))
+                filepath = os.path.join(copy, LEDGER_NAME)
+                _use_ledger(csvledger.CSVLedger(filepath))
+                scenario = _get_scenarios(filepath, chat_id,
+                                          config.min_amount)[name]
+                result = dict(bench(scenario, runs),
+                              command=name, size=size, runs=runs)
+                print(RESULT_TEMPLATE.format(**result))
+                results.append(result)
+                csvtail.forget(filepath)
+    finally:
+        shutil.rmtree(directory)
+
+    with open(output, 'w') as output_file:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'results': results}, output_file, indent=2)
+
+
+# TEMPLATES
+# =========
+
+RESULT_TEMPLATE = ("{command:>13} @ {size:>8}: "
+                   "p50 {p50_ms:8.3f} ms, p90 {p90_ms:8.3f} ms, "
+                   "p99 {p99_ms:8.3f} ms, cold {cold_ms:8.3f} ms, "
+                   "peak {peak_bytes:>9} B")
+STARTUP_TEMPLATE = ("{command:>13}: "
+                    "p50 {p50_ms:8.3f} ms, p90 {p90_ms:8.3f} ms, "
+                    "p99 {p99_ms:8.3f} ms, cold {cold_ms:8.3f} ms")
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(description="Benchmark Bilbot.")
+    PARSER.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    PARSER.add_argument('--runs', type=int, default=RUNS)
+    PARSER.add_argument('--output', default='benchmark.json')
+    PARSER.add_argument('--startup', action='store_true')
+    ARGS = PARSER.parse_args()
+    if ARGS.startup:
+        print(STARTUP_TEMPLATE.format(**startup(ARGS.runs)))
+    else:
+        run_all(ARGS.sizes, ARGS.runs, ARGS.output)
@@ -6,48 +6,141 @@ This source code is subject to the terms of the Mozilla Public License.
 You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
 """
 
-__AUTHOR__ = 'Nebil Kawas García'
-__LICENSE__ = 'MPL-2.0'
-__VERSION__ = '0.3.0'
+import time
+STARTED = time.perf_counter()  # before any (slow) import.
+
+# pylint: disable=wrong-import-position
 
-import inspect
 import logging
+import signal
+
+from functools import wraps
 
 import commands
+import ledger
+import logpipe
+import metrics
 import settings
+from dedup import UpdateCache
+from executor import ChatExecutor
+from metadata import __VERSION__
+from outbox import OUTBOX
+from router import CommandRouter
 
-from telegram.ext import (CommandHandler,
-                          MessageHandler,
-                          Filters,
-                          Updater,
-                          Dispatcher)
+from telegram.ext import Updater, Dispatcher
+from telegram.update import Update
 
 
 # MONKEY-PATCHING
 # ===============
 
 def _add_handlers(self):
-    # first, add all the defined commands.
-    all_commands = commands.COMMANDS.items()
-    for name, callback in all_commands:
-        has_args = 'args' in inspect.signature(callback).parameters
-        command_handler = CommandHandler(name, callback, pass_args=has_args)
-        self.add_handler(command_handler)
-
-    # and then, handle the _faulty_ cases.
-    unknown_handler = MessageHandler(Filters.command, commands.unknown)
-    self.add_handler(unknown_handler)
+    # remember the processed updates, across restarts.
+    self.processed = UpdateCache(settings.UPDATES, settings.DEDUP_SIZE)
+
+    # every command (even the _faulty_ ones) goes through the router.
+    executor = ChatExecutor(settings.WORKERS, settings.QUEUE_DEPTH)
+    router = CommandRouter(commands.COMMANDS, commands.unknown, executor,
+                           on_done=self.processed.finish)
+    self.add_handler(router)
 Dispatcher.add_handlers = _add_handlers
 
 
+def _process_once(original):
+    # a redelivered update is dropped before reaching any handler,
+    # but it's only stored as processed once it has been handled.
+    @wraps(original)
+    def wrapper(self, update):
+        if not isinstance(update, Update):
+            original(self, update)
+            return
+        if self.processed.is_duplicate(update):
+            logging.info("The update %s was already processed.",
+                         update.update_id)
+            return
+        try:
+            original(self, update)
+        finally:
+            if not getattr(update, 'routed', False):
+                self.processed.finish(update)
+    return wrapper
+Dispatcher.process_update = _process_once(Dispatcher.process_update)
+
+IMPORTED = time.perf_counter()
+
+# the restart loops give up on Bilbot if it isn't polling by then.
+STARTUP_BUDGET = 2.0  # seconds
+FLUSH_TIMEOUT = 5.0  # seconds
+
+
+def _log_startup(milestone):
+    """
+    Log how long Bilbot took to import its modules and to reach
+    a milestone (e.g. its first poll), warning whenever the whole
+    startup goes over its budget.
+    """
+
+    elapsed = time.perf_counter() - STARTED
+    logging.info("Bilbot v%s reached %s in %.0f ms (%.0f ms importing).",
+                 __VERSION__, milestone, elapsed * 1000,
+                 (IMPORTED - STARTED) * 1000)
+    if elapsed > STARTUP_BUDGET:
+        logging.warning("The startup went over its budget of %.0f ms.",
+                        STARTUP_BUDGET * 1000)
+
+
+def _on_first_poll(bot, callback):
+    """
+    Call back once the first 'getUpdates' round-trip has completed,
+    since 'start_polling' only spawns the thread that polls.
+    """
+
+    get_updates = bot.getUpdates
+
+    @wraps(get_updates)
+    def wrapper(*args, **kwargs):
+        updates = get_updates(*args, **kwargs)
+        bot.getUpdates = get_updates  # only once.
+        callback()
+        return updates
+    bot.getUpdates = wrapper
+
+
 if __name__ == '__main__':
-    logging.basicConfig(level=logging.INFO,
-                        filename=settings.LOGFILE,
-                        format=settings.LOGFORMAT,
-                        datefmt='%d/%b %H:%M:%S',
-                        style='{')  # for enabling str.format()-style.
+    # NOTE: the records are written by a background listener,
+    # ===== so a slow disk doesn't slow down the commands.
+    logpipe.start(settings.LOGFILE,
+                  settings.LOG_STYLE,
+                  settings.LOGFORMAT,
+                  datefmt='%d/%b %H:%M:%S')
+
+    # 'kill -HUP' re-reads the configuration, without restarting.
+    signal.signal(signal.SIGHUP, lambda signum, frame: settings.reload())
+
+    if settings.LEGACY_CHAT and ledger.migrate(settings.LEGACY_CHAT):
+        logging.info("The shared ledger now belongs to %s.",
+                     settings.LEGACY_CHAT)
+    # NOTE: otherwise, their records would silently go unseen.
+    for legacy_path in ledger.find_legacy():
+        logging.warning("%s is not read by any chat; declare its "
+                        "'legacy_chat' (and its backend) to migrate it.",
+                        legacy_path)
+
+    if settings.METRICS_PORT:
+        metrics.serve(settings.METRICS_PORT)
 
     updater = Updater(token=settings.BOT_TOKEN)
     updater.dispatcher.add_handlers()
-    updater.start_polling()
+    if settings.MODE == 'webhook':
+        import webhook  # NOTE: only needed (and loaded) in this mode.
+        webhook.start(updater)
+        _log_startup("listening for webhooks")
+    else:
+        _on_first_poll(updater.bot, lambda: _log_startup("its first poll"))
+        updater.start_polling()
+
+    # NOTE: 'idle' returns once the updater is stopped (by a signal),
+    # ===== so the pending replies still get a chance to be sent.
     updater.idle()
+    if not OUTBOX.flush(FLUSH_TIMEOUT):
+        logging.warning("Some replies were never sent.")
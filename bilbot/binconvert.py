@@ -0,0 +1,116 @@
+"""
+This module stores Bilbot's conversion between plain-text ledgers
+and binary ledgers.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+
+Plain-text ledgers can be converted (losslessly) in both directions with...
+$ python3 bilbot/binconvert.py to-binary accounts-42.txt accounts-42.bin
+$ python3 bilbot/binconvert.py to-csv accounts-42.bin accounts-42.txt
+"""
+
+import os
+import sys
+
+import archive
+import csvledger
+import csvrows
+import csvtotals
+from binledger import BinaryLedger, NameTable, get_names_path, pack_record
+from journal import get_journal_path
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def _iter_csv_lines(csv_path):
+    """
+    Yield every line of a plain-text ledger, in order,
+    starting with those of its archived periods.
+    """
+
+    directory = archive.get_archive_path(csv_path)
+    for ppid in archive.get_ppids(directory):
+        # NOTE: a crash may leave a segment of a period still in the ledger.
+        if csvtotals.is_archived(csv_path, ppid):
+            yield from archive.read_lines(directory, ppid)
+    with open(csv_path, encoding=csvrows.ENCODING) as csv_file:
+        yield from csv_file
+
+
+def _discard_journal(filepath):
+    """
+    Remove the journal of a ledger that is about to be overwritten,
+    since its entries would be meaningless in the new one.
+    """
+
+    try:
+        os.remove(get_journal_path(filepath))
+    except FileNotFoundError:
+        pass
+
+
+# CONVERTERS
+# ==========
+
+def to_binary(csv_path, target):
+    """
+    Convert a plain-text ledger (along with its archive) into a binary one.
+
+    >>> to_binary('accounts-42.txt', 'accounts-42.bin')
+    1319
+    """
+
+    _discard_journal(target)
+    names = NameTable(get_names_path(target))
+    count = 0
+    with csvledger.CSVLedger(csv_path).committer.locked(), \
+            open(target, 'wb') as binary_file:
+        for line in _iter_csv_lines(csv_path):
+            record_ = csvrows.to_record(line.rstrip('\n'))
+            if record_ is None:
+                continue
+            name = record_.name
+            index = None if name is None else names.intern(name)
+            binary_file.write(pack_record(record_.ppid, record_.uuid,
+                                          index, record_.amount))
+            count += 1
+    return count
+
+
+def to_csv(source, csv_path):
+    """
+    Convert a binary ledger into a plain-text one.
+    The target must have no archive, which would be mixed up with it.
+
+    >>> to_csv('accounts-42.bin', 'accounts-42.txt')
+    1319
+    """
+
+    if archive.get_ppids(archive.get_archive_path(csv_path)):
+        raise FileExistsError(ARCHIVE_CONFLICT.format(filepath=csv_path))
+    _discard_journal(csv_path)
+
+    records = BinaryLedger(source).read_records()
+    with open(csv_path, 'w', encoding=csvrows.ENCODING) as csv_file:
+        for record_ in records:
+            if record_.uuid is None:
+                csv_file.write(csvrows.format_boundary(record_.ppid))
+            else:
+                ppid, uuid, name, amount = record_
+                csv_file.write(csvrows.format_row([ppid, uuid, name, amount]))
+    return len(records)
+
+
+ARCHIVE_CONFLICT = "{filepath} has an archive; the ledger was not converted."
+CONVERTERS = {
+    'to-binary': to_binary,
+    'to-csv': to_csv,
+}
+
+
+if __name__ == '__main__':
+    CONVERTER, SOURCE, TARGET = sys.argv[1:]
+    print(CONVERTERS[CONVERTER](SOURCE, TARGET), 'records converted.')
@@ -0,0 +1,294 @@
+"""
+This module stores Bilbot's binary ledger.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+
+from committer import GroupCommitter
+from journal import Journal
+from ledger import Ledger, record, user
+from settings import COMMIT_WINDOW
+
+# every record is packed as: ppid, uuid, name (index), amount.
+RECORD = struct.Struct('<IqIq')
+NO_NAME = 0xFFFFFFFF  # the name index of the boundaries.
+ENCODING = 'utf-8'
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def get_names_path(filepath):
+    """
+    Return the path of the side table holding the names of a ledger.
+
+    >>> get_names_path('/data/accounts-42.bin')
+    '/data/accounts-42.names'
+    """
+
+    root, _ = os.path.splitext(filepath)
+    return '{}.names'.format(root)
+
+
+def _to_ppid(ppid):
+    """
+    Return a 'ppid' as it is handed over by the ledger interface.
+    Withdrawals made before opening any period are stored with zero.
+
+    >>> _to_ppid(3)
+    '3'
+
+    >>> _to_ppid(0)
+    ''
+    """
+
+    return str(ppid) if ppid else ''
+
+
+def pack_record(ppid, uuid=None, name=None, amount=None):
+    """
+    Pack a record, where the name is already an index.
+
+    >>> pack_record('2', 631104, 0, 4200)
+    b'\x02\x00\x00\x00@\xa1\t\x00\x00\x00\x00\x00\x00\x00\x00\x00h\x10[...]'
+    """
+
+    if uuid is None:
+        return RECORD.pack(int(ppid), 0, NO_NAME, 0)
+    return RECORD.pack(int(ppid or 0), uuid, name, amount)
+
+
+def _find(buffer, ppid, right=False):
+    """
+    Return the position of the first record of a purchase period
+    (or the first one after it, if 'right' is set),
+    bisecting the records, since their 'ppid' never decreases.
+    """
+
+    low, high = 0, len(buffer) // RECORD.size
+    while low < high:
+        middle = (low + high) // 2
+        middle_ppid, = struct.unpack_from('<I', buffer, middle * RECORD.size)
+        if middle_ppid < ppid or (right and middle_ppid == ppid):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+# USEFUL CLASSES
+# ====== =======
+
+class NameTable:
+    """
+    Intern the names of a ledger into a side table, one per line,
+    so that every record refers to a name by its (fixed-width) index.
+
+    >>> names = NameTable('accounts-42.names')
+    >>> names.intern('Bob')
+    0
+    >>> names[0]
+    'Bob'
+
+    The side table is shared with other processes (through a lock),
+    so the names they intern are read as soon as they are needed.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.names = []
+        self.indexes = {}
+        self.offset = 0  # how much of the side table has been read.
+        self._refresh()
+
+    def __getitem__(self, index):
+        if index >= len(self.names):
+            self._refresh()  # it was interned by another process.
+        return self.names[index]
+
+    def _add(self, name):
+        self.indexes[name] = len(self.names)
+        self.names.append(name)
+
+    def _load(self, names_file):
+        """
+        Read the names appended to a (locked) side table
+        since the last time it was read.
+        """
+
+        names_file.seek(self.offset)
+        for line in names_file:
+            self._add(json.loads(line.decode(ENCODING)))
+            self.offset += len(line)
+
+    def _refresh(self):
+        """
+        Read the names interned since the last time, if any.
+        """
+
+        with self.lock:
+            if os.path.isfile(self.filepath):
+                with open(self.filepath, 'rb') as names_file:
+                    fcntl.flock(names_file, fcntl.LOCK_SH)
+                    self._load(names_file)
+
+    def intern(self, name):
+        """
+        Return the index of a name, storing it (durably) if it's new.
+        """
+
+        with self.lock:
+            if name not in self.indexes:
+                with open(self.filepath, 'ab+') as names_file:
+                    fcntl.flock(names_file, fcntl.LOCK_EX)
+                    self._load(names_file)
+                    if name not in self.indexes:
+                        line = json.dumps(name, ensure_ascii=False) + '\n'
+                        names_file.write(line.encode(ENCODING))
+                        names_file.flush()
+                        os.fsync(names_file.fileno())
+                        self._add(name)
+                        self.offset = names_file.tell()
+            return self.indexes[name]
+
+
+# BACKEND
+# =======
+
+class BinaryLedger(Ledger):
+    """
+    Store the records in a binary file, as fixed-width packed integers,
+    reading them through a memory map: totals and aggregates become
+    a scan over a contiguous buffer, without parsing any text.
+
+    Appends go through a group committer, and every change goes
+    through a journal, just as in the CSV ledger;
+    reads share the committer's lock, even with other processes.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.names = NameTable(get_names_path(filepath))
+        self.journal = Journal(filepath)
+        self.committer = GroupCommitter(filepath, COMMIT_WINDOW,
+                                        journal=self.journal)
+        with self.committer.locked():
+            self.journal.replay()
+
+    def _read(self, function, *args):
+        """
+        Call a function with a (read-only) map of the whole ledger.
+        """
+
+        with self.committer.locked(shared=True), \
+                open(self.filepath, 'rb') as file_:
+            # NOTE: a partial record (i.e. a torn write) is never mapped.
+            size = os.fstat(file_.fileno()).st_size
+            size -= size % RECORD.size
+            if not size:
+                return function(b'', *args)
+            with mmap.mmap(file_.fileno(), size,
+                           access=mmap.ACCESS_READ) as buffer:
+                return function(buffer, *args)
+
+    def _unpack(self, fields):
+        ppid, uuid, name, amount = fields
+        if name == NO_NAME:
+            return record(_to_ppid(ppid), None, None, None)
+        return record(_to_ppid(ppid), uuid, self.names[name], amount)
+
+    def _slice_period(self, buffer, ppid):
+        ppid = int(ppid or 0)
+        start, end = _find(buffer, ppid), _find(buffer, ppid, right=True)
+        # NOTE: a view is sliced, so the records are never copied.
+        return memoryview(buffer)[start * RECORD.size:end * RECORD.size]
+
+    def read_records(self):
+        """
+        Return every record of the ledger, in order.
+        """
+
+        return self._read(lambda buffer: [self._unpack(row) for row
+                                          in RECORD.iter_unpack(buffer)])
+
+    def is_empty(self):
+        return os.path.getsize(self.filepath) < RECORD.size
+
+    def get_last_record(self):
+        def read_last(buffer):
+            if not buffer:
+                return None
+            offset = len(buffer) - RECORD.size
+            return self._unpack(RECORD.unpack_from(buffer, offset))
+        return self._read(read_last)
+
+    def get_ppids(self):
+        def list_ppids(buffer):
+            # NOTE: every period is skipped with a single bisection.
+            ppids, position = [], 0
+            while position * RECORD.size < len(buffer):
+                ppid, = struct.unpack_from('<I', buffer,
+                                           position * RECORD.size)
+                ppids.append(_to_ppid(ppid))
+                position = _find(buffer, ppid, right=True)
+            return ppids
+        return self._read(list_ppids)
+
+    def open_period(self, ppid):
+        self.committer.append(pack_record(ppid))
+
+    def withdraw(self, ppid, uuid, name, amount):
+        index = self.names.intern(name)
+        self.committer.append(pack_record(ppid, uuid, index, amount))
+
+    def list_period(self, ppid, start=0, stop=None):
+        def read_page(buffer):
+            rows = self._slice_period(buffer, ppid)
+            # NOTE: only the boundary (if any) precedes the withdrawals.
+            if rows and RECORD.unpack_from(rows)[2] == NO_NAME:
+                rows = rows[RECORD.size:]
+            page = rows[start * RECORD.size:
+                        None if stop is None else stop * RECORD.size]
+            return [self._unpack(row) for row in RECORD.iter_unpack(page)]
+        yield from self._read(read_page)
+
+    def aggregate_period(self, ppid):
+        def aggregate(buffer):
+            users = {}
+            for _, uuid, name, amount in RECORD.iter_unpack(
+                    self._slice_period(buffer, ppid)):
+                if name == NO_NAME:
+                    continue
+                _, total, count = users.get(uuid, (None, 0, 0))
+                users[uuid] = (name, total + amount, count + 1)
+            return [user(uuid, self.names[name], total, count)
+                    for uuid, (name, total, count) in users.items()]
+        return self._read(aggregate)
+
+    def total_period(self, ppid):
+        def total(buffer):
+            rows = RECORD.iter_unpack(self._slice_period(buffer, ppid))
+            return sum(amount for *_, amount in rows)
+        return self._read(total)
+
+    def rollback(self):
+        with self.committer.locked() as file_:
+            size = os.fstat(file_.fileno()).st_size
+            size -= size % RECORD.size
+            self.journal.truncate(file_, max(size - RECORD.size, 0))
+
+    def clear(self):
+        with self.committer.locked() as file_:
+            # NOTE: the names are kept, since a withdrawal in flight
+            # ===== may have already interned its own.
+            self.journal.truncate(file_, 0)
@@ -6,6 +6,7 @@ This source code is subject to the terms of the Mozilla Public License.
 You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
 """
 
+from functools import lru_cache
 from textwrap import dedent
 
 INTRO = "This new {release_type} release comes up with the following changes,"
@@ -121,4 +122,15 @@ def _fill_changelog(version):
     intro = INTRO.format(release_type=type_)
     return RELEASES[version].format(introduction=intro)
 
-RELEASES = {version: _fill_changelog(version) for version in RELEASES}
+
+@lru_cache(maxsize=None)
+def get_releases():
+    """
+    Return every release changelog, indexed by its version.
+    They are filled in once (on first use), instead of at import time.
+
+    >>> get_releases()['0.1.0']
+    'This first release comes up with an initial backbone [...]'
+    """
+
+    return {version: _fill_changelog(version) for version in RELEASES}
@@ -6,25 +6,21 @@ This source code is subject to the terms of the Mozilla Public License.
 You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
 """
 
-import csv
 import inspect
 import logging
-import os
+import math
+import time
 
-from collections import defaultdict, namedtuple
-from functools import reduce, wraps
-from subprocess import check_output
+from functools import lru_cache, wraps
 
-from bilbot import __VERSION__
+import analytics
 import changelog
+import ledger
 from messages import ERROR, INFO
-from settings import (WHITELIST,
-                      ACCOUNTS,
-                      FIELD_DELIMITER,
-                      GROUP_DELIMITER,
-                      CSV_KWARGS,
-                      MIN_AMOUNT,
-                      MAX_AMOUNT)
+from metadata import __VERSION__
+from metrics import METRICS
+from outbox import OUTBOX
+import settings
 
 from telegram.update import Update
 
@@ -55,12 +51,24 @@ Update.reply = _reply
 
 
 def _send(self, **kwargs):
+    # NOTE: the outbox takes care of Telegram's limits,
+    # ===== so the handler doesn't have to wait for it.
     sent_message = _itemize(self.buffer)
-    self.message.reply_text(sent_message, **kwargs)
+    chat_id = self.message.chat_id
+
+    # in a group, quote the command (just as 'reply_text' did),
+    # which also keeps replies to different commands from merging.
+    if self.message.chat.type != 'private':
+        kwargs.setdefault('reply_to_message_id', self.message.message_id)
+    OUTBOX.put(self.message.bot, chat_id, sent_message, **kwargs)
+    self.buffer = []
 Update.send = _send
 
 Update.user = property(lambda self: self.message.from_user)
 
+# NOTE: every chat keeps its own ledger.
+Update.ledger = property(lambda self: ledger.get_ledger(self.message.chat_id))
+
 
 # USEFUL FUNCTIONS
 # ====== =========
@@ -77,12 +85,33 @@ def logger(command):
     # pylint: disable=bad-whitespace
     # pylint: disable=unused-argument
     def wrapper(bot, update, **kwargs):
-        command(     update, **kwargs)
-        if command.__name__ == 'unknown':
-            command.__name__ = _get_command_name(update.message.text)
-        message = LOG_TEMPLATE.format(user=update.user.first_name,
-                                      command=command.__name__)
-        logging.info(message)
+        update.outcome = 'ok'
+        start = time.monotonic()
+        try:
+            command( update, **kwargs)
+        except Exception:
+            update.outcome = 'error'
+            raise
+        finally:
+            duration = time.monotonic() - start
+            name = command.__name__
+            if name == 'unknown':
+                # NOTE: commands may run concurrently,
+                # ===== so the function itself must not be renamed.
+                name = _get_command_name(update.message.text)
+            user = update.user.first_name
+            fields = {
+                'user': user,
+                'command': name,
+                'chat': update.message.chat_id,
+                'outcome': update.outcome,
+                'duration': round(duration, 6),
+            }
+            # the unknown commands are counted together, as 'unknown'.
+            label, *_ = command.__name__.split('_')
+            METRICS.observe(label, update.outcome, fields['chat'], duration)
+            logging.info(LOG_TEMPLATE.format(user=user, command=name),
+                         extra=fields)
     return wrapper
 
 
@@ -94,56 +123,17 @@ def sentry(command):
     @wraps(command)
     def wrapper(update, **kwargs):
         chat_id = str(update.message.chat.id)
-        if WHITELIST is None or chat_id in WHITELIST.split(','):
+        whitelist = settings.get_snapshot().whitelist
+        if whitelist is None or chat_id in whitelist:
             command(update, **kwargs)
         else:
+            update.outcome = 'not_authorized'
             name = update.user.first_name
             update.reply(ERROR.NOT_AUTHORIZED.format(user=name))
             update.send()
     return wrapper
 
 
-def _is_not_empty(filepath):
-    """
-    Check whether a file is empty or not.
-
-    >>> _is_not_empty('empty.txt')
-    False
-    """
-
-    return os.path.isfile(filepath) and os.path.getsize(filepath)
-
-
-def _get_last_line():
-    """
-    Return the last line written in the accounts file.
-    It could be a withdrawal or a new purchase period.
-
-    >>> _get_last_line()
-    ['2', 631104, 'Bob', '4.200']
-
-    # a purchase period is opened
-    >>> _get_last_line()
-    ['3=', '']
-    """
-
-    last_line = check_output(['tail', '-1', ACCOUNTS]).decode('utf-8')
-    return last_line.rstrip().split(FIELD_DELIMITER)
-
-
-def _get_last_ppid():
-    """
-    Return the current 'ppid' as a string
-    (aka. the purchase period identifier).
-
-    >>> _get_last_ppid()
-    '3'
-    """
-
-    last_ppid, *_ = _get_last_line()
-    return last_ppid.replace(GROUP_DELIMITER, '')
-
-
 def _get_commands():
     """
     Yield all the defined commands.
@@ -203,6 +193,216 @@ def _to_money(amount):
     return '{:,}'.format(amount).replace(',', '.')
 
 
+def _to_millis(seconds):
+    """
+    Return a formatted duration, in milliseconds.
+
+    >>> _to_millis(0.0125)
+    '12,5 ms'
+
+    >>> _to_millis(float('inf'))
+    '∞ ms'
+    """
+
+    if seconds == float('inf'):
+        return '∞ ms'
+    return '{:.1f} ms'.format(seconds * 1000).replace('.', ',')
+
+
+def _render_help():
+    """
+    Render the replies of `/help` and `/help <cmd>`.
+
+    >>> _render_help()[('help', 'start')]
+    '🚀 `start` 🚀\n\nEste comando sirve para finalizar mi somnolencia. [...]'
+    """
+
+    def format_(name, function, length):
+        summary, *_ = inspect.getdoc(function).split('\n')
+        return CMD_TEMPLATE.format(command=name,
+                                   summary=summary,
+                                   fill=length)
+
+    cmd_dict = sorted(COMMANDS.items())
+    max_length = max(map(len, COMMANDS))  # find the longest command.
+    commands = (format_(*cmd, length=max_length) for cmd in cmd_dict)
+    responses = {('help',): INFO.HELP.format(commands=_itemize(commands))}
+
+    for cmd_name, cmd_func in cmd_dict:
+        _, *details = inspect.getdoc(cmd_func).split('\n')
+        responses['help', cmd_name] = _itemize(details)
+    return responses
+
+
+def _render_about():
+    """
+    Render the replies of `/about`, `/about latest`,
+    `/about releases` and `/about <version>`.
+
+    >>> _render_about()[('about',)]
+    'Hola, mi nombre es Nebilbot. [...]'
+    """
+
+    def format_(version):
+        release_type = changelog.get_release_type(version)
+        return VER_TEMPLATE[release_type].format(version)
+
+    releases = changelog.get_releases()
+    numbers = map(format_, sorted(releases.keys()))
+    latest = INFO.ABOUT_LATEST.format(latest=__VERSION__)
+    responses = {
+        ('about',): INFO.ABOUT.format(version=__VERSION__),
+        ('about', 'releases'):
+        INFO.ABOUT_RELEASES.format(releases=_itemize(numbers)),
+        ('about', 'latest'): _itemize([latest, releases[__VERSION__]]),
+    }
+
+    for version, release in releases.items():
+        responses['about', version] = release
+    return responses
+
+
+@lru_cache(maxsize=None)
+def _get_responses():
+    """
+    Return every reply that never changes while Bilbot is running,
+    rendered once (on first use) and indexed by the command and its args.
+
+    >>> _get_responses()[('about', '0.2.2')]
+    'This new patch release comes up with the following changes, [...]'
+    """
+
+    responses = _render_help()
+    responses.update(_render_about())
+    return responses
+
+
+def _get_page(options):
+    """
+    Return the page that `/list` was asked for, or None if it's not valid.
+
+    >>> _get_page(['page', '2'])
+    2
+
+    >>> _get_page(['agg'])
+    1
+    """
+
+    if options in ([], ['agg']):
+        return 1
+    if len(options) == 2 and options[0] == 'page' and options[1].isdigit():
+        return int(options[1]) or None
+    return None
+
+
+def _get_range(args):
+    """
+    Return the range of periods that `/history` was asked for,
+    or None if it's not valid.
+
+    >>> _get_range(['3', '5'])
+    (3, 5)
+
+    >>> _get_range(['3'])
+    (3, inf)
+    """
+
+    if len(args) > 2 or not all(arg.isdigit() for arg in args):
+        return None
+    numbers = list(map(int, args))
+    first = numbers[0] if numbers else 0
+    last = numbers[1] if len(numbers) == 2 else float('inf')
+    return (first, last) if first <= last else None
+
+
+def _parse_period(args, ppid):
+    """
+    Split the arguments of `/list` into the period they refer to
+    (the current one, by default), the command that lists it,
+    and the remaining options.
+
+    >>> _parse_period(['3', 'page', '2'], '5')
+    ('3', '/list 3', ['page', '2'])
+
+    >>> _parse_period(['agg'], '5')
+    ('5', '/list', ['agg'])
+    """
+
+    if args and args[0].isdigit():
+        # NOTE: the withdrawals made before any period are in the zeroth.
+        number = int(args[0])
+        return str(number or ''), '/list {}'.format(number), args[1:]
+    return ppid, '/list', args
+
+
+def _reply_page(update, ppid, page, command):
+    """
+    Reply with a page of a period, along with its total,
+    returning whether that page exists.
+    """
+
+    page_size = settings.get_snapshot().list_page_size
+    pages = math.ceil(update.ledger.count_period(ppid) / page_size)
+    if not pages:
+        update.reply(ERROR.EMPTY_PERIOD.format(ppid=int(ppid or 0)))
+    elif page > pages:
+        update.reply(ERROR.WRONG_PAGE.format(page=page))
+    else:
+        # NOTE: only the requested page is kept in the buffer.
+        start = (page - 1) * page_size
+        update.reply(INFO.ANTE_LIST)
+        for record in update.ledger.list_period(ppid, start,
+                                                start + page_size):
+            update.reply(INFO.EACH_LIST.format(
+                user=record.name, amount=_to_money(record.amount)))
+
+        # NOTE: the running totals spare us from adding everything up.
+        total = update.ledger.total_period(ppid)
+        update.reply(INFO.POST_LIST.format(amount=_to_money(total)))
+        update.reply(INFO.LIST_PAGE.format(page=page, pages=pages))
+        if page < pages:
+            update.reply(INFO.NEXT_PAGE.format(command=command,
+                                               page=page + 1))
+    return page <= pages
+
+
+def _reply_history(update, selected):
+    """
+    Reply with the total of every selected period,
+    as long as there are some, but not too many.
+    """
+
+    if not selected:
+        update.reply(ERROR.EMPTY_HISTORY)
+    elif len(selected) > HISTORY_LENGTH:
+        update.reply(ERROR.LONG_HISTORY.format(limit=HISTORY_LENGTH))
+    else:
+        # NOTE: every period is summed up from its running totals,
+        # ===== so no record is read along the way.
+        grand_total = 0
+        update.reply(INFO.ANTE_HISTORY)
+        for ppid in selected:
+            total = update.ledger.total_period(ppid)
+            grand_total += total
+            update.reply(INFO.EACH_HISTORY.format(
+                ppid=int(ppid or 0), amount=_to_money(total)))
+
+        update.reply(INFO.POST_HISTORY.format(
+            amount=_to_money(grand_total)))
+        _reply_stats(update, selected)
+
+
+def _reply_stats(update, ppids):
+    """
+    Reply with the amount withdrawn by each user over some periods.
+    """
+
+    table = analytics.load(update.ledger, ppids)
+    for stat in analytics.aggregate(table):
+        update.reply(INFO.EACH_LIST.format(user=stat.name,
+                                           amount=_to_money(stat.amount)))
+
+
 # COMMANDS
 # ========
 
@@ -241,25 +441,10 @@ def about_command(update, args):
     `/about 0.2.2`
     """
 
-    def format_(version):
-        release_type = changelog.get_release_type(version)
-        return VER_TEMPLATE[release_type].format(version)
-
-    if len(args) == 0:
-        update.reply(INFO.ABOUT.format(version=__VERSION__))
-    elif len(args) == 1:
-        argument = args[0]
-        releases = changelog.RELEASES
-        if argument == 'releases':
-            numbers = map(format_, sorted(releases.keys()))
-            message = INFO.ABOUT_RELEASES.format(releases=_itemize(numbers))
-        elif argument == 'latest':
-            update.reply(INFO.ABOUT_LATEST.format(latest=__VERSION__))
-            message = releases[__VERSION__]
-        else:
-            error_message = ERROR.WRONG_ARGUMENT.format(argument=argument)
-            message = releases.get(argument, error_message)
-        update.reply(message)
+    if len(args) <= 1:
+        key = ('about',) + tuple(args)
+        error_message = ERROR.WRONG_ARGUMENT.format(argument=_itemize(args))
+        update.reply(_get_responses().get(key, error_message))
     else:
         update.reply(ERROR.TOO_MANY_ARGUMENTS)
     update.send(parse_mode='markdown')
@@ -277,27 +462,11 @@ def help_command(update, args):
     • `/help <comando>` proporciona más detalles sobre ese comando.
     """
 
-    def format_(name, function, length):
-        summary, *_ = inspect.getdoc(function).split('\n')
-        return CMD_TEMPLATE.format(command=name,
-                                   summary=summary,
-                                   fill=length)
-
-    if len(args) == 0:
-        cmd_dict = sorted(COMMANDS.items())
-        max_length = max(map(len, COMMANDS))  # find the longest command.
-        commands = (format_(*cmd, length=max_length) for cmd in cmd_dict)
-        help_message = INFO.HELP.format(commands=_itemize(commands))
-        update.reply(help_message)
-    elif len(args) == 1:
-        cmd_name = args[0]
-        cmd_func = COMMANDS.get(cmd_name, None)
-        if cmd_func:
-            _, *details = inspect.getdoc(cmd_func).split('\n')
-            update.reply(_itemize(details))
-        else:
-            cmd_name = '/{}'.format(cmd_name)
-            update.reply(ERROR.UNKNOWN_COMMAND.format(command=cmd_name))
+    if len(args) <= 1:
+        key = ('help',) + tuple(args)
+        cmd_name = '/{}'.format(_itemize(args))
+        error_message = ERROR.UNKNOWN_COMMAND.format(command=cmd_name)
+        update.reply(_get_responses().get(key, error_message))
     else:
         update.reply(ERROR.TOO_MANY_ARGUMENTS)
     update.send(parse_mode='markdown')
@@ -315,16 +484,13 @@ def new_command(update):
     Cada periodo puede almacenar una o más transacciones.
     """
 
-    last_ppid, *rest = _get_last_line()
-    is_already_opened = _is_not_empty(ACCOUNTS) and not any(rest)
+    last_record = update.ledger.get_last_record()
+    is_already_opened = last_record and last_record.uuid is None
     if is_already_opened:
         update.reply(ERROR.ALREADY_OPENED)
     else:
-        with open(ACCOUNTS, 'a') as accounts:
-            new_ppid = int(last_ppid or 0) + 1
-            boundary = NEW_TEMPLATE.format(ppid=new_ppid,
-                                           delimiter=GROUP_DELIMITER)
-            accounts.write(boundary)
+        new_ppid = int(update.ledger.get_last_ppid() or 0) + 1
+        update.ledger.open_period(new_ppid)
         update.reply(INFO.POST_NEW.format(user=update.user.first_name))
     update.send()
 
@@ -336,73 +502,92 @@ def list_command(update, args):
     Muestra todos los registros.
     📊 `list` 📊
 
-    Este comando cuenta con dos modalidades.
-    • `/list` muestra una lista con las transacciones realizadas;
-    • `/list agg` añade, además, los datos agregados por usuario.
+    Este comando cuenta con cuatro modalidades.
+    • `/list` muestra la primera página de transacciones realizadas;
+    • `/list page <n>` muestra la página `n` de estas transacciones;
+    • `/list agg` añade, además, los datos agregados por usuario;
+    • `/list <periodo>` muestra un periodo anterior (y admite lo mismo).
+    Por ejemplo, para ver la segunda página del periodo `3`:
+    `/list 3 page 2`
     """
 
-    def is_from_ppid(line, ppid):
-        """
-        Check whether a withdrawal is from a specific period.
+    last_record = update.ledger.get_last_record()
+    ppid, command, options = _parse_period(
+        args, last_record and last_record.ppid)
+    page = _get_page(options)
 
-        >>> is_from_ppid('1;314;Alice;7.650\n', '1')
-        True
+    if not (last_record and (last_record.uuid or command != '/list')):
+        update.reply(ERROR.NO_STORED_ACCOUNTS)
+    elif page is None:
+        update.reply(ERROR.WRONG_ARGUMENT.format(argument=' '.join(args)))
+    else:
+        is_listed = _reply_page(update, ppid, page, command)
+        if is_listed and options == ['agg']:
+            update.reply(INFO.POST_AGGREGATE_LIST)
+            _reply_stats(update, [ppid])
+    update.send(parse_mode='markdown')
 
-        >>> is_from_ppid('2=\n', '2')
-        False
-        """
 
-        line_ppid, *rest = line
-        return line_ppid == ppid if any(rest) else None
+@logger
+@sentry
+def history_command(update, args):
+    """
+    Resume los periodos anteriores.
+    🗓 `history` 🗓
 
-    def process(line):
-        """
-        Process a string with a "<ppid>;<uuid>;<name>;<amount>" format,
-        replying to the user and returning the amount.
+    Este comando entrega el total de cada periodo, y el de cada humano.
+    • `/history` resume los periodos más recientes;
+    • `/history <desde>` resume desde ese periodo hasta el actual;
+    • `/history <desde> <hasta>` resume ese rango de periodos.
+    Por ejemplo, para resumir desde el periodo `3` hasta el `5`:
+    `/history 3 5`
+    """
 
-        >>> process('1;314225;Alice;7.650\n')
-        7650            # (a message is sent)
-        """
+    ppids = update.ledger.get_ppids()
+    range_ = _get_range(args)
+    if not ppids:
+        update.reply(ERROR.NO_STORED_ACCOUNTS)
+    elif range_ is None:
+        update.reply(ERROR.WRONG_ARGUMENT.format(argument=' '.join(args)))
+    else:
+        first, last = range_
+        selected = [ppid for ppid in ppids if first <= int(ppid or 0) <= last]
+        _reply_history(update,
+                       selected if args else selected[-HISTORY_LENGTH:])
+    update.send(parse_mode='markdown')
 
-        *_, uuid, name, amount = line
-        update.reply(INFO.EACH_LIST.format(user=name, amount=amount))
-        user = namedtuple('user', ['uuid', 'name'])
-        return user(uuid, name), int(amount.replace('.', ''))
 
-    def sum_amount(aggregate, row_record):
-        """
-        Add an amount of money to a specific user,
-        to build a dictionary with aggregate data.
+@logger
+@sentry
+def top_command(update, args):
+    """
+    Conoce a quienes más gastan.
+    🏆 `top` 🏆
 
-        >>> sum_amount({'Alice': 600, Bob': 500},
-                                    ('Bob', 300))
-        {'Alice': 600, 'Bob': 800}
-        """
+    Este comando ordena a los humanos según cuánto han sacado
+    en el periodo actual, indicando también su número de compras.
+    • `/top` muestra a los tres humanos que más han sacado;
+    • `/top <n>` muestra a los `n` humanos que más han sacado.
+    """
 
-        user, amount = row_record
-        aggregate[user] += amount
-        return aggregate
-
-    last_ppid, *rest = _get_last_line()
-    if _is_not_empty(ACCOUNTS) and any(rest):
-        with open(ACCOUNTS, 'r') as accounts:
-            reader = csv.reader(accounts, **CSV_KWARGS)
-            update.reply(INFO.ANTE_LIST)
-            from_last_ppid = (process(line) for line in reader
-                              if is_from_ppid(line, last_ppid))
-
-            aggregate = reduce(sum_amount, from_last_ppid, defaultdict(int))
-            total = sum(aggregate.values())
-            update.reply(INFO.POST_LIST.format(amount=_to_money(total)))
-
-            if args and args[0] == 'agg':
-                update.reply(INFO.POST_AGGREGATE_LIST)
-                for user, amount in aggregate.items():
-                    amount = _to_money(amount)
-                    update.reply(INFO.EACH_LIST.format(user=user.name,
-                                                       amount=amount))
-    else:
+    last_record = update.ledger.get_last_record()
+    is_valid = len(args) <= 1 and all(arg.isdigit() for arg in args)
+    size = int(args[0]) if args and is_valid else TOP_SIZE
+    if not (last_record and last_record.uuid):
         update.reply(ERROR.NO_STORED_ACCOUNTS)
+    elif not (is_valid and size):
+        argument = ' '.join(args)
+        update.reply(ERROR.WRONG_ARGUMENT.format(argument=argument))
+    else:
+        table = analytics.load(update.ledger, [last_record.ppid])
+        update.reply(INFO.ANTE_TOP)
+        for place, stat in enumerate(analytics.top(table, size), 1):
+            amount, mean = _to_money(stat.amount), _to_money(round(stat.mean))
+            update.reply(INFO.EACH_TOP.format(place=place,
+                                              user=stat.name,
+                                              amount=amount,
+                                              count=stat.count,
+                                              mean=mean))
     update.send(parse_mode='markdown')
 
 
@@ -423,16 +608,14 @@ def withdraw_command(update, args):
         Write a new record into the accounts document,
         using the following format: "<ppid>;<uuid>;<name>;<amount>".
 
-        >>> add_record('1', 314225, 'Alice', '650')
+        >>> add_record('1', 314225, 'Alice', 650)
         write('1;314225;Alice;650\n')
 
-        >>> add_record('2', 631104, 'Bob', '4.200')
-        write('2;631104;Bob;4.200\n')
+        >>> add_record('2', 631104, 'Bob', 4200)
+        write('2;631104;Bob;4200\n')
         """
 
-        with open(ACCOUNTS, 'a') as accounts:
-            writer = csv.writer(accounts, **CSV_KWARGS)
-            writer.writerow([ppid, uuid, name, amount])
+        update.ledger.withdraw(ppid, uuid, name, amount)
 
     def withdraw(amount):
         """
@@ -446,12 +629,13 @@ def withdraw_command(update, args):
         # ValueError
         """
 
-        if MIN_AMOUNT <= amount <= MAX_AMOUNT:
-            amount = _to_money(amount)
-            ppid = _get_last_ppid()
+        config = settings.get_snapshot()
+        if config.min_amount <= amount <= config.max_amount:
+            ppid = update.ledger.get_last_ppid()
             uuid = update.user.id
             first_name = update.user.first_name
-            message = INFO.ANTE_WITHDRAW.format(amount=amount, user=first_name)
+            message = INFO.ANTE_WITHDRAW.format(amount=_to_money(amount),
+                                                user=first_name)
             update.reply(message)
             add_record(ppid, uuid, first_name, amount)
             update.reply(INFO.POST_WITHDRAW)
@@ -486,10 +670,8 @@ def rollback_command(update):
     🚫 No es posible hacer `rollback` de un `clear` o de un mismo `rollback`.
     """
 
-    if _is_not_empty(ACCOUNTS):
-        lines = open(ACCOUNTS, 'r').readlines()
-        with open(ACCOUNTS, 'w') as accounts:
-            accounts.writelines(lines[:-1])
+    if not update.ledger.is_empty():
+        update.ledger.rollback()
         update.reply(INFO.POST_ROLLBACK)
     else:
         update.reply(ERROR.NO_STORED_ACCOUNTS)
@@ -507,19 +689,45 @@ def clear_command(update):
     ⚠️ Esto puede provocar efectos altamente destructivos.
     """
 
-    if _is_not_empty(ACCOUNTS):
-        with open(ACCOUNTS, 'w'):
-            pass
-
-        # NOTE: I could also write...
-        # open(ACCOUNTS, 'w').close()
-
+    if not update.ledger.is_empty():
+        update.ledger.clear()
         update.reply(INFO.POST_CLEAR)
     else:
         update.reply(ERROR.NO_STORED_ACCOUNTS)
     update.send()
 
 
+@logger
+@sentry
+def stats_command(update):
+    """
+    Revisa mi desempeño.
+    ⏱ `stats` ⏱
+
+    Este comando resume cuántas veces se ha usado cada comando,
+    y cuánto he tardado en responder (en promedio, y en los percentiles).
+    🔐 Sólo los administradores pueden usar este comando.
+    """
+
+    admins = settings.get_snapshot().admins
+    if str(update.user.id) not in admins:
+        update.outcome = 'not_authorized'
+        update.reply(ERROR.NOT_ADMIN.format(user=update.user.first_name))
+    else:
+        summaries = METRICS.summarize()
+        update.reply(INFO.ANTE_STATS if summaries else ERROR.NO_STATS)
+        for summary in summaries:
+            update.reply(INFO.EACH_STATS.format(
+                command=summary.command,
+                count=summary.count,
+                errors=summary.errors,
+                rejections=summary.rejections,
+                mean=_to_millis(summary.mean),
+                p50=_to_millis(summary.p50),
+                p95=_to_millis(summary.p95)))
+    update.send(parse_mode='markdown')
+
+
 @logger
 @sentry
 def unknown(update):
@@ -536,8 +744,9 @@ def unknown(update):
 # =========
 
 CMD_TEMPLATE = "`{command:>{fill}}` — {summary}"
+TOP_SIZE = 3  # the amount of users that '/top' shows by default.
+HISTORY_LENGTH = 12  # the most periods that '/history' summarizes at once.
 LOG_TEMPLATE = "{user} called {command}."
-NEW_TEMPLATE = "{ppid}{delimiter}\n"
 VER_TEMPLATE = {
     'major': '✨ `{}`',
     'minor': '🎁 `{}`',
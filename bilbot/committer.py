@@ -0,0 +1,170 @@
+"""
+This module stores Bilbot's group committer.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import fcntl
+import logging
+import os
+import queue
+import threading
+import time
+
+from contextlib import contextmanager
+
+
+# USEFUL CLASSES
+# ====== =======
+
+class _Request:
+    """
+    Hold some data waiting to be appended,
+    along with the outcome of its commit.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = None
+        self.error = None
+        self.done = threading.Event()
+
+
+# COMMITTER
+# =========
+
+class GroupCommitter:
+    """
+    Serialize every append to a file, using an advisory lock,
+    and commit them in groups: all the appends that arrive within
+    a short window (while others are queued) are written at once
+    and share a single fsync.
+
+    >>> committer = GroupCommitter('accounts.txt', window=0.002)
+    >>> committer.append(b'2;631104;Bob;4200\n')
+    1319            # (once the record is durable)
+    """
+
+    def __init__(self, filepath, window, prepare=None, on_commit=None,
+                 journal=None):
+        self.filepath = filepath
+        self.window = window
+        self.journal = journal
+        self.prepare = prepare
+        self.on_commit = on_commit
+        self.lock = threading.RLock()
+        self.requests = queue.Queue()
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+
+    @contextmanager
+    def locked(self, shared=False):
+        """
+        Hold the file, both within this process (against the committer
+        thread) and across processes: exclusively in order to change it,
+        or shared with other readers in order to read it.
+        """
+
+        with self.lock:
+            file_ = self._lock_file(fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield file_
+            finally:
+                fcntl.flock(file_, fcntl.LOCK_UN)
+                file_.close()
+
+    def _lock_file(self, operation):
+        """
+        Open the file and lock it, making sure that it wasn't replaced
+        (e.g. by a compaction) while waiting for the lock.
+        """
+
+        while True:
+            file_ = open(self.filepath, 'ab')
+            fcntl.flock(file_, operation)
+            inode = os.fstat(file_.fileno()).st_ino
+            if inode == os.stat(self.filepath).st_ino:
+                return file_
+            file_.close()
+
+    def append(self, data):
+        """
+        Append some bytes to the file, blocking until they are durable.
+        Return the offset where they were written.
+        """
+
+        request = _Request(data)
+        self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.offset
+
+    def _collect(self):
+        """
+        Wait for a request and gather every other one
+        that arrives before the window closes.
+
+        The window is only opened when some other request is already
+        queued; otherwise (e.g. the commands of a single chat, which run
+        one after another) waiting would add latency and batch nothing.
+        """
+
+        batch = [self.requests.get()]
+        if self.requests.empty():
+            return batch
+        deadline = time.monotonic() + self.window
+        while True:
+            try:
+                timeout = max(deadline - time.monotonic(), 0)
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                return batch
+
+    def _commit(self, batch):
+        """
+        Write a batch of requests with a single write and a single fsync.
+        """
+
+        with self.locked() as file_:
+            if self.prepare:
+                self.prepare()
+
+            offset = file_.seek(0, os.SEEK_END)
+            data = b''.join(request.data for request in batch)
+            if self.journal:
+                # the fsync goes to the journal, and not to the file.
+                self.journal.append(file_, offset, data)
+            else:
+                file_.write(data)
+                file_.flush()
+                os.fsync(file_.fileno())
+
+            for request in batch:
+                request.offset = offset
+                offset += len(request.data)
+
+            # NOTE: the batch is already durable at this point,
+            # ===== so a failing hook must not be reported as a failed commit.
+            try:
+                if self.on_commit:
+                    self.on_commit(batch)
+            # pylint: disable=broad-except
+            except Exception:
+                logging.exception("The commit hook of %s failed.",
+                                  self.filepath)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._commit(batch)
+            # pylint: disable=broad-except
+            except Exception as error:
+                for request in batch:
+                    request.error = error
+            finally:
+                for request in batch:
+                    request.done.set()
@@ -0,0 +1,113 @@
+"""
+This module stores Bilbot's compaction of plain-text ledgers,
+which moves their closed purchase periods into the archive.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+
+import archive
+import csvindex
+import csvtotals
+from csvrows import ENCODING, is_boundary
+from csvtail import get_size
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def _split_periods(lines):
+    """
+    Group some ledger lines by their purchase period.
+
+    >>> list(_split_periods(['1=\n', '1;631104;Bob;4200\n', '2=\n']))
+    [('1', ['1=\n', '1;631104;Bob;4200\n']), ('2', ['2=\n'])]
+    """
+
+    ppid, group = '', []
+    for line in lines:
+        if is_boundary(line.rstrip()):
+            if group:
+                yield ppid, group
+            ppid, group = line.rstrip()[:-1], []
+        group.append(line)
+    if group:
+        yield ppid, group
+
+
+def _archive_closed(filepath, ledger, end):
+    """
+    Write every purchase period of an (open) ledger before an offset
+    into the archive, along with its running totals.
+    """
+
+    aggregates = csvtotals.get_aggregates(filepath)
+    directory = archive.get_archive_path(filepath)
+    lines = csvindex.iter_lines(ledger, 0, end)
+    for ppid, group in _split_periods(lines):
+        summary = aggregates.get(ppid, {'total': 0, 'users': {}})
+        archive.write_segment(directory, ppid, summary, group)
+
+
+def rebuild(filepath):
+    """
+    Rebuild every cache and sidecar of a ledger,
+    which must be done after replacing it.
+    """
+
+    csvindex.rebuild(filepath)
+    csvtotals.rebuild(filepath)
+
+
+# ARCHIVING
+# =========
+
+def compact(filepath, journal):
+    """
+    Move every closed purchase period of a ledger into its archive,
+    one compressed segment per period, so the ledger only keeps
+    the open one (i.e. everything from its latest boundary onwards).
+
+    The segments are durable before the ledger is replaced,
+    and a period is always read from the ledger if it's still there,
+    so a crash in between only leaves a redundant segment behind.
+    The journal is emptied beforehand, since its offsets
+    would be meaningless in the compacted ledger.
+    """
+
+    periods = csvindex.get_periods(filepath)
+    if not periods or not periods[-1].offset:
+        return  # there's no closed period.
+
+    open_offset = periods[-1].offset
+    with open(filepath, 'rb') as ledger:
+        journal.checkpoint(ledger)
+        _archive_closed(filepath, ledger, open_offset)
+        ledger.seek(open_offset)
+        with open(filepath + '.tmp', 'wb') as compacted:
+            compacted.write(ledger.read())
+            compacted.flush()
+            os.fsync(compacted.fileno())
+    os.replace(filepath + '.tmp', filepath)
+    rebuild(filepath)
+
+
+def restore(filepath, journal):
+    """
+    Move the latest archived period back into an empty ledger,
+    which must be done once its successor has been rolled back.
+    """
+
+    directory = archive.get_archive_path(filepath)
+    ppids = archive.get_ppids(directory)
+    if get_size(filepath) or not ppids:
+        return
+
+    lines = archive.read_lines(directory, ppids[-1])
+    with open(filepath, 'ab') as ledger:
+        journal.append(ledger, 0, ''.join(lines).encode(ENCODING))
+    archive.remove_segment(directory, ppids[-1])
+    rebuild(filepath)
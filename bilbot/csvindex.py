@@ -0,0 +1,227 @@
+"""
+This module stores Bilbot's index of plain-text ledgers,
+i.e. where each of their purchase periods starts.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+from collections import namedtuple
+
+from csvrows import ENCODING, format_boundary, is_boundary
+from csvtail import forget, get_last_line, get_size, get_stamp
+from settings import FIELD_DELIMITER, GROUP_DELIMITER
+
+# pylint: disable=invalid-name
+period = namedtuple('period', ['ppid', 'offset'])
+
+# the purchase periods of every ledger, indexed by its filepath.
+_INDEXES = {}
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def get_sidecar_path(filepath, extension):
+    """
+    Return the path of a sidecar file of a ledger.
+
+    >>> get_sidecar_path('/data/accounts.txt', 'idx')
+    '/data/accounts.idx'
+    """
+
+    root, _ = os.path.splitext(filepath)
+    return '{}.{}'.format(root, extension)
+
+
+def _scan_periods(filepath):
+    """
+    Find every purchase period by reading the whole ledger.
+    This is only needed when the sidecar index is unusable.
+
+    >>> _scan_periods('accounts.txt')
+    [period(ppid='1', offset=0), period(ppid='2', offset=57)]
+    """
+
+    periods = []
+    if get_size(filepath):
+        with open(filepath, 'rb') as ledger:
+            offset = 0
+            for raw_line in ledger:
+                line = raw_line.decode(ENCODING).rstrip()
+                if is_boundary(line):
+                    periods.append(period(line[:-1], offset))
+                offset += len(raw_line)
+    return periods
+
+
+def _read_index(filepath):
+    """
+    Read the sidecar index of a ledger, with a "<ppid>;<offset>" format.
+    Return None if it's missing or malformed.
+    """
+
+    try:
+        with open(get_sidecar_path(filepath, 'idx'), 'r') as index:
+            return [period(ppid, int(offset))
+                    for ppid, offset
+                    in (line.rstrip().split(FIELD_DELIMITER)
+                        for line in index)]
+    except (OSError, ValueError):
+        return None
+
+
+def _write_index(filepath, periods):
+    """
+    Replace the sidecar index of a ledger, atomically.
+    """
+
+    index_path = get_sidecar_path(filepath, 'idx')
+    with open(index_path + '.tmp', 'w') as index:
+        index.writelines(INDEX_TEMPLATE.format(ppid=ppid,
+                                               offset=offset,
+                                               delimiter=FIELD_DELIMITER)
+                         for ppid, offset in periods)
+    os.replace(index_path + '.tmp', index_path)
+
+
+def _is_consistent(filepath, periods):
+    """
+    Check whether an index still describes a ledger,
+    looking at its latest period and the ledger's last line.
+    """
+
+    last_ppid, *_ = get_last_line(filepath).split(FIELD_DELIMITER)
+    if not (periods and last_ppid):
+        return not (periods or last_ppid)
+
+    ppid, offset = periods[-1]
+    with open(filepath, 'rb') as ledger:
+        ledger.seek(offset)
+        boundary = format_boundary(ppid).encode(ENCODING)
+        is_pointing = ledger.readline() == boundary
+    return is_pointing and last_ppid.rstrip(GROUP_DELIMITER) == ppid
+
+
+# PERIODS
+# =======
+
+def get_periods(filepath):
+    """
+    Return every purchase period of a ledger (and where it starts),
+    rebuilding the sidecar index whenever it is missing or stale.
+
+    >>> get_periods('accounts.txt')
+    [period(ppid='1', offset=0), period(ppid='2', offset=57)]
+    """
+
+    stamp = get_stamp(filepath)
+    cached = _INDEXES.get(filepath)
+    if cached is None or cached[0] != stamp:
+        periods = _read_index(filepath)
+        if periods is None or not _is_consistent(filepath, periods):
+            periods = _scan_periods(filepath)
+            _write_index(filepath, periods)
+        cached = _INDEXES[filepath] = (stamp, periods)
+    return cached[1]
+
+
+def get_period_bounds(filepath, ppid):
+    """
+    Return the offsets where a purchase period starts and ends,
+    falling back to the whole ledger if the period is unknown.
+
+    >>> get_period_bounds('accounts.txt', '1')
+    (0, 57)
+    """
+
+    periods = get_periods(filepath)
+    end = get_size(filepath)
+    for number, period_ in enumerate(periods):
+        if period_.ppid == ppid:
+            is_last = number + 1 == len(periods)
+            return period_.offset, end if is_last else periods[number + 1][1]
+    return 0, end
+
+
+def iter_lines(ledger, start, end):
+    """
+    Yield the lines of an (open) ledger between two offsets.
+
+    >>> list(iter_lines(ledger, 57, 1338))
+    ['2=\n', '2;631104;Bob;4200\n']
+    """
+
+    if start < end:
+        ledger.seek(start)
+        for raw_line in ledger:
+            yield raw_line.decode(ENCODING)
+            start += len(raw_line)
+            if start >= end: break
+
+
+# UPDATING
+# ========
+
+def remember(filepath, offset, lines):
+    """
+    Fold some lines that have just been appended to a ledger
+    (at a given offset) into its sidecar index.
+
+    >>> remember('accounts.txt', 1338, ['3=', '3;314225;Alice;650'])
+    """
+
+    _, periods = _INDEXES[filepath]
+    new_periods = []
+    for line in lines:
+        if is_boundary(line):
+            new_periods.append(period(line[:-1], offset))
+        offset += len(line.encode(ENCODING)) + 1
+
+    if new_periods:
+        with open(get_sidecar_path(filepath, 'idx'), 'a') as index:
+            index.writelines(INDEX_TEMPLATE.format(ppid=ppid,
+                                                   offset=offset_,
+                                                   delimiter=FIELD_DELIMITER)
+                             for ppid, offset_ in new_periods)
+        periods.extend(new_periods)
+
+    _INDEXES[filepath] = (get_stamp(filepath), periods)
+
+
+def drop_tail(filepath, last):
+    """
+    Unregister the last line of a ledger (as returned by 'get_tail'),
+    which must be done after truncating the ledger where it starts.
+    """
+
+    if is_boundary(last.line):
+        # NOTE: the latest period is gone along with its boundary.
+        _, periods = _INDEXES.pop(filepath, (None, None))
+        if periods is None:
+            get_periods(filepath)  # the stale index will be rebuilt.
+        else:
+            _write_index(filepath, periods[:-1])
+            _INDEXES[filepath] = (get_stamp(filepath), periods[:-1])
+    elif filepath in _INDEXES:
+        _INDEXES[filepath] = (get_stamp(filepath), _INDEXES[filepath][1])
+
+
+def rebuild(filepath):
+    """
+    Rebuild the sidecar index of a ledger (forgetting its cached tail),
+    which must be done after replacing (or emptying) it.
+    """
+
+    forget(filepath)
+    periods = _scan_periods(filepath)
+    _write_index(filepath, periods)
+    _INDEXES[filepath] = (get_stamp(filepath), periods)
+
+
+# TEMPLATES
+# =========
+
+INDEX_TEMPLATE = "{ppid}{delimiter}{offset}\n"
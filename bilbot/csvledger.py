@@ -0,0 +1,198 @@
+"""
+This module stores Bilbot's plain-text ledger.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import itertools
+from contextlib import ExitStack
+
+import archive
+import csvindex
+import csvtail
+import csvtotals
+from committer import GroupCommitter
+from csvarchive import compact, rebuild, restore
+from csvrows import (ENCODING,
+                     format_boundary,
+                     format_row,
+                     is_boundary,
+                     to_record)
+from csvtail import get_last_line, get_size, get_tail
+from journal import Journal
+from ledger import Ledger
+from settings import COMMIT_WINDOW
+
+# NOTE: the rest of this ledger lives in its sibling modules:
+# ===== [1] 'csvrows', with the format of its lines;
+#       [2] 'csvtail', with its last line;
+#       [3] 'csvindex', with its periods;
+#       [4] 'csvtotals', with its running totals;
+#       [5] 'csvarchive', with its compaction;
+#       [6] 'csvmigrate', with the migration of its amounts.
+
+
+# LEDGER
+# ======
+
+def prepare(filepath):
+    """
+    Load every cache of a ledger (from its sidecars, if needed),
+    which must be done right before appending to it.
+    """
+
+    get_tail(filepath)
+    csvindex.get_periods(filepath)
+    csvtotals.get_aggregates(filepath)
+
+
+def remember(filepath, offset, text):
+    """
+    Fold some lines that have just been appended to a ledger
+    into its cached tail, its sidecar index and its running totals.
+
+    >>> remember('accounts.txt', 1338, '3=\n3;314225;Alice;650\n')
+    """
+
+    lines = text.splitlines()
+    csvtail.remember(filepath, lines[-1])
+    csvindex.remember(filepath, offset, lines)
+    csvtotals.remember(filepath, lines)
+
+
+def rollback(filepath, journal):
+    """
+    Remove the last line of a ledger, which could be either
+    a withdrawal or a purchase period boundary.
+
+    The file is truncated in place where its last line begins,
+    so the cost doesn't depend on the size of the ledger,
+    and a crash is redone from the journal.
+    """
+
+    prepare(filepath)
+    last = get_tail(filepath)
+    with open(filepath, 'rb+') as ledger:
+        journal.truncate(ledger, last.offset)
+    csvtail.forget(filepath)
+    csvindex.drop_tail(filepath, last)
+    csvtotals.remember(filepath, [last.line], sign=-1)
+
+
+def clear(filepath, journal):
+    """
+    Remove every record from a ledger (and its sidecars and archive).
+    """
+
+    with open(filepath, 'rb+') as ledger:
+        journal.truncate(ledger, 0)
+    rebuild(filepath)
+    archive.clear(archive.get_archive_path(filepath))
+
+
+# BACKEND
+# =======
+
+class CSVLedger(Ledger):
+    """
+    Store the records in a plain-text file, one record per line,
+    along with a sidecar index and some sidecar running totals.
+
+    Every append goes through a group committer, so concurrent
+    withdrawals share a single write (and a single fsync),
+    while rollbacks and clears hold the very same lock
+    (and reads share it, even with other processes).
+    The caches are stamped with the ledger they describe,
+    so whatever another process changes is noticed under that lock.
+    Every change is recorded in a journal before it's applied,
+    which is replayed when the ledger is opened.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.journal = Journal(filepath)
+        self.committer = GroupCommitter(filepath, COMMIT_WINDOW,
+                                        prepare=self._prepare,
+                                        on_commit=self._remember,
+                                        journal=self.journal)
+        with self.committer.locked():
+            if self.journal.replay():
+                rebuild(filepath)
+
+    def _prepare(self):
+        prepare(self.filepath)
+
+    def _remember(self, batch):
+        offset = batch[0].offset
+        text = b''.join(request.data for request in batch)
+        remember(self.filepath, offset, text.decode(ENCODING))
+
+    def _iter_lines(self, ppid, stack):
+        """
+        Return the lines of a purchase period, either from the archive
+        or from the ledger, which is kept open (within a stack)
+        so that it's read as it was, even if it's compacted meanwhile.
+        """
+
+        with self.committer.locked(shared=True):
+            if csvtotals.is_archived(self.filepath, ppid):
+                directory = archive.get_archive_path(self.filepath)
+                return archive.read_lines(directory, ppid)
+            begin, end = csvindex.get_period_bounds(self.filepath, ppid)
+            # pylint: disable=consider-using-with
+            ledger = stack.enter_context(open(self.filepath, 'rb'))
+            return csvindex.iter_lines(ledger, begin, end)
+
+    def is_empty(self):
+        directory = archive.get_archive_path(self.filepath)
+        size = get_size(self.filepath)
+        return not (size or archive.get_ppids(directory))
+
+    def get_last_record(self):
+        with self.committer.locked(shared=True):
+            return to_record(get_last_line(self.filepath))
+
+    def get_ppids(self):
+        with self.committer.locked(shared=True):
+            return csvtotals.get_ppids(self.filepath)
+
+    def open_period(self, ppid):
+        self.committer.append(format_boundary(ppid).encode(ENCODING))
+        with self.committer.locked():
+            compact(self.filepath, self.journal)
+
+    def withdraw(self, ppid, uuid, name, amount):
+        row = format_row([ppid, uuid, name, amount])
+        self.committer.append(row.encode(ENCODING))
+
+    def list_period(self, ppid, start=0, stop=None):
+        with ExitStack() as stack:
+            lines = self._iter_lines(ppid, stack)
+            # NOTE: the lines before 'start' are skipped without parsing.
+            rows = (line for line in lines if not is_boundary(line.rstrip()))
+            for line in itertools.islice(rows, start, stop):
+                record_ = to_record(line.rstrip())
+                if record_ and record_.ppid == ppid:
+                    yield record_
+
+    def aggregate_period(self, ppid):
+        with self.committer.locked(shared=True):
+            return csvtotals.get_aggregate(self.filepath, ppid)
+
+    def total_period(self, ppid):
+        with self.committer.locked(shared=True):
+            return csvtotals.get_total(self.filepath, ppid)
+
+    def rollback(self):
+        # NOTE: the ledger is never left empty while the archive isn't,
+        # ===== so rolling back a boundary brings its predecessor back.
+        with self.committer.locked():
+            restore(self.filepath, self.journal)
+            rollback(self.filepath, self.journal)
+            restore(self.filepath, self.journal)
+
+    def clear(self):
+        with self.committer.locked():
+            clear(self.filepath, self.journal)
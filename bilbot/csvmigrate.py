@@ -0,0 +1,91 @@
+"""
+This module stores Bilbot's migration of plain-text ledgers
+to plain integer amounts.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+
+Older ledgers (whose amounts are dotted, such as "4.200") can be migrated
+to plain integer amounts, in place, with...
+$ python3 bilbot/csvmigrate.py accounts-42.txt
+"""
+
+import os
+import sys
+
+import archive
+from csvarchive import rebuild
+from csvledger import CSVLedger
+from csvrows import ENCODING, format_row, is_boundary, parse_row, to_amount
+
+
+# MIGRATION
+# =========
+
+def _migrate_line(line):
+    """
+    Rewrite a ledger line, storing its amount as a plain integer.
+
+    >>> _migrate_line('2;631104;Bob;4.200\n')
+    '2;631104;Bob;4200\n'
+    """
+
+    stripped = line.rstrip('\n')
+    if not stripped or is_boundary(stripped):
+        return line
+    ppid, uuid, name, amount = parse_row(stripped)
+    return format_row([ppid, uuid, name, to_amount(amount)])
+
+
+def _migrate_archive(filepath):
+    """
+    Rewrite every dotted amount of the archive of a ledger,
+    one segment at a time. Return how many lines were rewritten.
+    """
+
+    changed = 0
+    directory = archive.get_archive_path(filepath)
+    for ppid in archive.get_ppids(directory):
+        lines = archive.read_lines(directory, ppid)
+        new_lines = [_migrate_line(line) for line in lines]
+        if new_lines != lines:
+            summary = archive.read_summary(directory, ppid)
+            archive.write_segment(directory, ppid, summary, new_lines)
+            changed += sum(map(str.__ne__, lines, new_lines))
+    return changed
+
+
+def migrate(filepath):
+    """
+    Rewrite every dotted amount of a ledger (and of its archive)
+    as a plain integer, streaming the ledger line by line.
+    Return how many lines were rewritten.
+
+    >>> migrate('accounts-42.txt')
+    1319
+    """
+
+    changed = 0
+    with open(filepath, 'rb') as ledger, \
+            open(filepath + '.tmp', 'wb') as migrated:
+        for raw_line in ledger:
+            line = raw_line.decode(ENCODING)
+            new_line = _migrate_line(line)
+            changed += new_line != line
+            migrated.write(new_line.encode(ENCODING))
+        migrated.flush()
+        os.fsync(migrated.fileno())
+
+    if changed:
+        os.replace(filepath + '.tmp', filepath)
+        rebuild(filepath)
+    else:
+        os.remove(filepath + '.tmp')
+    return changed + _migrate_archive(filepath)
+
+
+if __name__ == '__main__':
+    for FILEPATH in sys.argv[1:]:
+        with CSVLedger(FILEPATH).committer.locked():
+            print(FILEPATH, migrate(FILEPATH), 'lines migrated.')
@@ -0,0 +1,114 @@
+"""
+This module stores Bilbot's plain-text ledger format.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import csv
+import io
+
+from ledger import record
+from settings import CSV_KWARGS, GROUP_DELIMITER
+
+ENCODING = 'utf-8'
+
+
+# ROWS
+# ====
+
+def parse_row(line):
+    """
+    Split a ledger line into its fields.
+
+    >>> parse_row('2;631104;Bob;4200')
+    ['2', '631104', 'Bob', '4200']
+    """
+
+    row, = csv.reader([line], **CSV_KWARGS)
+    return row
+
+
+def format_row(fields):
+    """
+    Join some fields into a ledger line.
+
+    >>> format_row(['2', 631104, 'Bob', '4200'])
+    '2;631104;Bob;4200\n'
+    """
+
+    row = io.StringIO()
+    writer = csv.writer(row, **CSV_KWARGS)
+    writer.writerow(fields)
+    return row.getvalue()
+
+
+def format_boundary(ppid):
+    """
+    Return the line that opens a purchase period.
+
+    >>> format_boundary('3')
+    '3=\n'
+    """
+
+    return BOUNDARY_TEMPLATE.format(ppid=ppid, delimiter=GROUP_DELIMITER)
+
+
+def to_amount(amount):
+    """
+    Return the integer value of a stored amount, which is either
+    a plain integer or (in older ledgers) a dotted one.
+
+    >>> to_amount('4200')
+    4200
+
+    >>> to_amount('4.200')
+    4200
+    """
+
+    try:
+        return int(amount)
+    except ValueError:
+        return int(amount.replace('.', ''))
+
+
+def to_record(line):
+    """
+    Turn a ledger line into a record,
+    or return None if the line is empty.
+
+    >>> to_record('2;631104;Bob;4200')
+    record(ppid='2', uuid=631104, name='Bob', amount=4200)
+
+    >>> to_record('3=')
+    record(ppid='3', uuid=None, name=None, amount=None)
+    """
+
+    if not line:
+        return None
+    if is_boundary(line):
+        return record(line[:-1], None, None, None)
+
+    ppid, uuid, name, amount = parse_row(line)
+    return record(ppid, int(uuid), name, to_amount(amount))
+
+
+def is_boundary(line):
+    """
+    Check whether a line opens a new purchase period.
+
+    >>> is_boundary('3=')
+    True
+
+    >>> is_boundary('2;631104;Bob;4200')
+    False
+    """
+
+    return line.endswith(GROUP_DELIMITER)
+
+
+# TEMPLATES
+# =========
+
+BOUNDARY_TEMPLATE = "{ppid}{delimiter}\n"
@@ -0,0 +1,137 @@
+"""
+This module stores Bilbot's cache of the last line of plain-text ledgers.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+from collections import namedtuple
+
+from csvrows import ENCODING
+
+CHUNK_SIZE = 4096
+
+# pylint: disable=invalid-name
+tail = namedtuple('tail', ['stamp', 'offset', 'line'])
+
+# the last line of every ledger, indexed by its filepath.
+_TAILS = {}
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def get_size(filepath):
+    """
+    Return the size of a file, or zero if it doesn't exist.
+
+    >>> get_size('accounts.txt')
+    1337
+    """
+
+    try:
+        return os.path.getsize(filepath)
+    except OSError:
+        return 0
+
+
+def get_stamp(filepath):
+    """
+    Return what tells a version of a file apart from another one:
+    its size, its modification time and its inode.
+    Unlike its size alone, it changes whenever another process
+    rewrites the file, even if it's left just as long as it was.
+
+    >>> get_stamp('accounts.txt')
+    (1338, 1476489600000000000, 2752517)
+    """
+
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return (0, 0, 0)
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def _read_last_line(filepath):
+    """
+    Read the last line of a file by seeking backwards from its end,
+    returning its byte offset along with its (stripped) content.
+
+    >>> _read_last_line('accounts.txt')
+    (1319, '2;631104;Bob;4200')
+
+    >>> _read_last_line('empty.txt')
+    (0, '')
+    """
+
+    with open(filepath, 'rb') as file_:
+        position = file_.seek(0, os.SEEK_END)
+        chunk = b''
+        while position > 0:
+            step = min(CHUNK_SIZE, position)
+            position -= step
+            file_.seek(position)
+            chunk = file_.read(step) + chunk
+
+            # NOTE: the trailing newline belongs to the last line.
+            newline = chunk.rfind(b'\n', 0, len(chunk) - 1)
+            if newline != -1:
+                line = chunk[newline + 1:]
+                return position + newline + 1, line.decode(ENCODING).rstrip()
+    return 0, chunk.decode(ENCODING).rstrip()
+
+
+# TAILS
+# =====
+
+def get_tail(filepath):
+    """
+    Return the last line of a ledger (and where it starts),
+    reading the file only when the cached one is outdated.
+
+    >>> get_tail('accounts.txt')
+    tail(stamp=(1338, 1476489600000000000, 2752517), offset=1319, ...)
+    """
+
+    stamp = get_stamp(filepath)
+    cached = _TAILS.get(filepath)
+    if cached is None or cached.stamp != stamp:
+        offset, line = _read_last_line(filepath) if stamp[0] else (0, '')
+        cached = _TAILS[filepath] = tail(stamp, offset, line)
+    return cached
+
+
+def get_last_line(filepath):
+    """
+    Return the last line written in a ledger.
+
+    >>> get_last_line('accounts.txt')
+    '2;631104;Bob;4200'
+    """
+
+    return get_tail(filepath).line
+
+
+def forget(filepath):
+    """
+    Drop the cached last line of a ledger,
+    which must be done after rewriting it.
+    """
+
+    _TAILS.pop(filepath, None)
+
+
+def remember(filepath, line):
+    """
+    Cache the last line of a ledger, which has just been appended
+    to it (and therefore ends where the ledger does).
+
+    >>> remember('accounts.txt', '3;314225;Alice;650')
+    """
+
+    stamp = get_stamp(filepath)
+    start = stamp[0] - len(line.encode(ENCODING)) - 1
+    _TAILS[filepath] = tail(stamp, start, line)
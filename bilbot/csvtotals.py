@@ -0,0 +1,208 @@
+"""
+This module stores Bilbot's running totals of plain-text ledgers.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import json
+import os
+
+import archive
+from csvindex import get_sidecar_path
+from csvrows import ENCODING, is_boundary, parse_row, to_amount
+from csvtail import get_size, get_stamp
+from ledger import user
+
+# the running totals of every ledger, indexed by its filepath.
+_AGGREGATES = {}
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def _fold(periods, line, sign=1):
+    """
+    Add (or subtract) a ledger line to some running totals,
+    with a "{<ppid>: {'total': <int>, 'users': {<uuid>: [...]}}}" format.
+
+    >>> _fold({}, '2;631104;Bob;4200')
+    {'2': {'total': 4200, 'users': {'631104': ['Bob', 4200, 1]}}}
+    """
+
+    if is_boundary(line):
+        ppid = line[:-1]
+        if sign > 0:
+            periods.setdefault(ppid, {'total': 0, 'users': {}})
+        else:
+            periods.pop(ppid, None)
+    elif line:
+        ppid, uuid, name, amount = parse_row(line)
+        totals = periods.setdefault(ppid, {'total': 0, 'users': {}})
+        amount = sign * to_amount(amount)
+        _, sum_, count = totals['users'].get(uuid, [name, 0, 0])
+        totals['total'] += amount
+        totals['users'][uuid] = [name, sum_ + amount, count + sign]
+        if count + sign == 0:
+            del totals['users'][uuid]
+    return periods
+
+
+def _scan_aggregates(filepath):
+    """
+    Compute the running totals by reading the whole ledger.
+    This is only needed when the sidecar aggregates are unusable.
+    """
+
+    periods = {}
+    if get_size(filepath):
+        with open(filepath, 'rb') as ledger:
+            for raw_line in ledger:
+                _fold(periods, raw_line.decode(ENCODING).rstrip())
+    return periods
+
+
+def _read_aggregates(filepath):
+    """
+    Read the sidecar aggregates of a ledger.
+    Return None if they are missing, malformed or stale.
+    """
+
+    try:
+        with open(get_sidecar_path(filepath, 'agg'), 'r') as aggregates:
+            snapshot = json.load(aggregates)
+    except (OSError, ValueError):
+        return None
+
+    is_stale = snapshot.get('stamp') != list(get_stamp(filepath))
+    return None if is_stale else snapshot.get('periods')
+
+
+def _write_aggregates(filepath, periods):
+    """
+    Replace the sidecar aggregates of a ledger, atomically,
+    stamping them with the ledger they describe (see 'get_stamp').
+    """
+
+    aggregate_path = get_sidecar_path(filepath, 'agg')
+    snapshot = {'stamp': get_stamp(filepath), 'periods': periods}
+    with open(aggregate_path + '.tmp', 'w') as aggregates:
+        json.dump(snapshot, aggregates, separators=(',', ':'))
+    os.replace(aggregate_path + '.tmp', aggregate_path)
+
+
+def get_aggregates(filepath):
+    """
+    Return the running totals of a ledger,
+    rebuilding them whenever they are missing or stale.
+    """
+
+    stamp = get_stamp(filepath)
+    cached = _AGGREGATES.get(filepath)
+    if cached is None or cached[0] != stamp:
+        periods = _read_aggregates(filepath)
+        if periods is None:
+            periods = _scan_aggregates(filepath)
+            _write_aggregates(filepath, periods)
+        cached = _AGGREGATES[filepath] = (stamp, periods)
+    return cached[1]
+
+
+# PERIODS
+# =======
+
+def _get_summary(filepath, ppid):
+    """
+    Return the running totals of a purchase period,
+    from the ledger itself or else from its archive.
+
+    >>> _get_summary('accounts.txt', '2')
+    {'total': 4200, 'users': {'631104': ['Bob', 4200, 1]}}
+    """
+
+    aggregates = get_aggregates(filepath)
+    if ppid in aggregates:
+        return aggregates[ppid]
+    directory = archive.get_archive_path(filepath)
+    return archive.read_summary(directory, ppid) or {'total': 0, 'users': {}}
+
+
+def is_archived(filepath, ppid):
+    """
+    Check whether a purchase period lives in the archive of a ledger
+    (and not in the ledger itself).
+    """
+
+    if ppid in get_aggregates(filepath):
+        return False
+    directory = archive.get_archive_path(filepath)
+    return archive.read_summary(directory, ppid) is not None
+
+
+def get_ppids(filepath):
+    """
+    Return the 'ppid' of every purchase period,
+    either archived or still within the ledger, in order.
+
+    >>> get_ppids('accounts.txt')
+    ['', '1', '2']
+    """
+
+    directory = archive.get_archive_path(filepath)
+    ppids = set(archive.get_ppids(directory))
+    ppids.update(get_aggregates(filepath))
+    return sorted(ppids, key=lambda ppid: int(ppid or 0))
+
+
+def get_aggregate(filepath, ppid):
+    """
+    Return the running totals of every user within a purchase period.
+
+    >>> get_aggregate('accounts.txt', '2')
+    [user(uuid=631104, name='Bob', amount=4200, count=1)]
+    """
+
+    totals = _get_summary(filepath, ppid)
+    return [user(int(uuid), *values)
+            for uuid, values in totals['users'].items()]
+
+
+def get_total(filepath, ppid):
+    """
+    Return the grand total of a purchase period.
+
+    >>> get_total('accounts.txt', '2')
+    4200
+    """
+
+    return _get_summary(filepath, ppid)['total']
+
+
+# UPDATING
+# ========
+
+def remember(filepath, lines, sign=1):
+    """
+    Fold some lines that have just been appended to a ledger
+    (or subtract those just removed from it) into its running totals.
+
+    >>> remember('accounts.txt', ['3=', '3;314225;Alice;650'])
+    """
+
+    _, aggregates = _AGGREGATES[filepath]
+    for line in lines:
+        _fold(aggregates, line, sign)
+    _write_aggregates(filepath, aggregates)
+    _AGGREGATES[filepath] = (get_stamp(filepath), aggregates)
+
+
+def rebuild(filepath):
+    """
+    Rebuild the running totals of a ledger,
+    which must be done after replacing (or emptying) it.
+    """
+
+    aggregates = _scan_aggregates(filepath)
+    _write_aggregates(filepath, aggregates)
+    _AGGREGATES[filepath] = (get_stamp(filepath), aggregates)
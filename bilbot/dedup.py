@@ -0,0 +1,149 @@
+"""
+This module stores Bilbot's cache of processed updates.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+import struct
+import threading
+
+from collections import OrderedDict
+
+# every processed update is packed as: update_id, chat_id, message_id.
+ENTRY = struct.Struct('<qqq')
+NO_MESSAGE = (0, 0)  # the chat and 'message_id' of an update without any.
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def _get_key(update):
+    """
+    Return the chat and 'message_id' of an update.
+
+    >>> _get_key(update)
+    (-1337, 2718)
+    """
+
+    message = update.message
+    return (message.chat_id, message.message_id) if message else NO_MESSAGE
+
+
+# CACHE
+# =====
+
+class UpdateCache:
+    """
+    Remember the most recently processed updates (up to 'size'),
+    so that one redelivered by Telegram is recognized in constant time,
+    either by its 'update_id' or by its chat and 'message_id'.
+
+    An update is only kept in memory while it's being handled,
+    and it's appended to a file once it has been, so that one
+    fetched (but never handled) before a crash is handled after it.
+    The file is read back when starting, and rewritten once it
+    doubles the size of the cache.
+
+    Hence, updates are handled *at least* once: if Bilbot crashes
+    after a command has changed a ledger, but before its update is
+    stored (a window as short as a single write), the redelivered
+    update will change that ledger once again.
+
+    >>> cache = UpdateCache('updates.bin', size=4096)
+    >>> cache.is_duplicate(update)
+    False
+    >>> cache.is_duplicate(update)
+    True
+    >>> cache.finish(update)
+    """
+
+    def __init__(self, filepath, size):
+        self.filepath = filepath
+        self.size = size
+        self.lock = threading.Lock()
+        self.updates = OrderedDict()  # (chat_id, message_id) by update_id.
+        self.messages = {}  # update_id by (chat_id, message_id).
+        self.handling = {}  # the same as 'updates', while being handled.
+        self.handling_messages = set()
+        self.entries = 0  # the amount of entries in the file.
+        self._load()
+        self.file_ = open(filepath, 'ab')
+
+    def _load(self):
+        try:
+            with open(self.filepath, 'rb') as updates_file:
+                data = updates_file.read()
+        except FileNotFoundError:
+            return
+
+        # NOTE: a partial entry (i.e. a torn write) is ignored.
+        data = data[:len(data) - len(data) % ENTRY.size]
+        for update_id, chat_id, message_id in ENTRY.iter_unpack(data):
+            self._remember(update_id, (chat_id, message_id))
+        self.entries = len(data) // ENTRY.size
+
+    def _remember(self, update_id, message):
+        self.updates[update_id] = message
+        if message != NO_MESSAGE:
+            self.messages[message] = update_id
+        if len(self.updates) > self.size:
+            oldest_id, oldest = self.updates.popitem(last=False)
+            if self.messages.get(oldest) == oldest_id:
+                del self.messages[oldest]
+
+    def _compact(self):
+        """
+        Rewrite the file (atomically) with only the cached updates.
+        """
+
+        self.file_.close()
+        with open(self.filepath + '.tmp', 'wb') as updates_file:
+            updates_file.write(b''.join(
+                ENTRY.pack(update_id, *message)
+                for update_id, message in self.updates.items()))
+        os.replace(self.filepath + '.tmp', self.filepath)
+        self.file_ = open(self.filepath, 'ab')
+        self.entries = len(self.updates)
+
+    def is_duplicate(self, update):
+        """
+        Check whether an update was already processed (or it's being
+        processed right now), taking it as being handled otherwise.
+        """
+
+        key = _get_key(update)
+        with self.lock:
+            if update.update_id in self.updates or key in self.messages:
+                self.updates.move_to_end(
+                    self.messages.get(key, update.update_id))
+                return True
+            is_handling = update.update_id in self.handling
+            if is_handling or key in self.handling_messages:
+                return True
+
+            self.handling[update.update_id] = key
+            if key != NO_MESSAGE:
+                self.handling_messages.add(key)
+            return False
+
+    def finish(self, update):
+        """
+        Remember (and store) an update, once it has been handled.
+        """
+
+        with self.lock:
+            key = self.handling.pop(update.update_id, None)
+            if key is None:
+                return
+            self.handling_messages.discard(key)
+            self._remember(update.update_id, key)
+            # NOTE: written without an fsync, so a crash loses nothing,
+            # ===== and only a power loss could forget the latest ones.
+            self.file_.write(ENTRY.pack(update.update_id, *key))
+            self.file_.flush()
+            self.entries += 1
+            if self.entries >= 2 * self.size:
+                self._compact()
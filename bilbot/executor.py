@@ -0,0 +1,85 @@
+"""
+This module stores Bilbot's command executor.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import logging
+import queue
+import threading
+
+from collections import deque
+
+
+# EXECUTOR
+# ========
+
+class ChatExecutor:
+    """
+    Run tasks on a pool of workers, where tasks sharing a key
+    (i.e. coming from the same chat) run strictly one after another,
+    while tasks with different keys run in parallel.
+
+    At most 'depth' tasks can be pending at once; beyond that,
+    'submit' blocks the caller, pushing back on the dispatcher.
+
+    >>> executor = ChatExecutor(workers=4, depth=64)
+    >>> executor.submit(chat_id, list_command, bot, update, args=[])
+    """
+
+    def __init__(self, workers, depth):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(depth)
+        self.ready = queue.Queue()
+        self.pending = {}  # the queued tasks of every busy key.
+        for number in range(workers):
+            name = 'executor-{}'.format(number)
+            thread = threading.Thread(target=self._work, name=name,
+                                      daemon=True)
+            thread.start()
+
+    def submit(self, key, function, *args, **kwargs):
+        """
+        Schedule a task, to be run after every other task with that key.
+        Without workers, the task is simply run right away.
+        """
+
+        task = (function, args, kwargs)
+        if not self.workers:
+            self._run(task)
+            return
+
+        self.slots.acquire()
+        with self.lock:
+            if key in self.pending:
+                self.pending[key].append(task)
+                return
+            self.pending[key] = deque()
+        self.ready.put((key, task))
+
+    @staticmethod
+    def _run(task):
+        function, args, kwargs = task
+        try:
+            function(*args, **kwargs)
+        # pylint: disable=broad-except
+        except Exception:
+            logging.exception("%s failed.", function.__name__)
+
+    def _work(self):
+        while True:
+            key, task = self.ready.get()
+            self._run(task)
+            self.slots.release()
+
+            # hand over the next task of this key, if any.
+            with self.lock:
+                tasks = self.pending[key]
+                if not tasks:
+                    del self.pending[key]
+                    continue
+                next_task = tasks.popleft()
+            self.ready.put((key, next_task))
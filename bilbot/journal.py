@@ -0,0 +1,184 @@
+"""
+This module stores Bilbot's write-ahead journal.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import logging
+import os
+import struct
+import zlib
+
+# every entry is packed as: checksum, kind, offset, length (and payload).
+CHECKSUM = struct.Struct('<I')
+HEADER = struct.Struct('<cQI')
+APPEND = b'A'
+TRUNCATE = b'T'
+CHECKPOINT_SIZE = 1 << 20  # the journal is emptied beyond a mebibyte.
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def get_journal_path(filepath):
+    """
+    Return the path of the journal of a ledger, named after
+    its whole filename, since every backend needs its own journal.
+
+    >>> get_journal_path('/data/accounts-42.txt')
+    '/data/accounts-42.txt.journal'
+    """
+
+    return '{}.journal'.format(filepath)
+
+
+def _pack(kind, offset, data=b''):
+    """
+    Pack an entry, prefixed by the checksum of everything else.
+
+    >>> _pack(TRUNCATE, 1319)
+    b"P\x85\xb9\xdbT'\x05\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+    """
+
+    body = HEADER.pack(kind, offset, len(data)) + data
+    return CHECKSUM.pack(zlib.crc32(body)) + body
+
+
+def _iter_entries(stream):
+    """
+    Yield every entry of a journal, as (kind, offset, payload),
+    stopping at the first one that is torn or corrupted.
+    """
+
+    prefix = CHECKSUM.size + HEADER.size
+    while True:
+        head = stream.read(prefix)
+        if len(head) < prefix:
+            return
+        checksum, = CHECKSUM.unpack_from(head)
+        kind, offset, length = HEADER.unpack_from(head, CHECKSUM.size)
+        payload = stream.read(length)
+        body = head[CHECKSUM.size:] + payload
+        if len(payload) < length or zlib.crc32(body) != checksum:
+            return
+        yield kind, offset, payload
+
+
+def _is_applied(ledger, entries):
+    """
+    Check whether an (open) ledger already reflects some entries,
+    i.e. it has the size set by the last one, along with every
+    appended byte that wasn't truncated afterwards.
+    """
+
+    size, writes = None, []
+    for kind, offset, payload in entries:
+        writes = [(start, data[:offset - start])
+                  for start, data in writes if start < offset]
+        if kind == APPEND:
+            writes.append((offset, payload))
+        size = offset + len(payload)
+
+    if size is None:
+        return True
+    if os.fstat(ledger.fileno()).st_size != size:
+        return False
+    for start, data in writes:
+        ledger.seek(start)
+        if ledger.read(len(data)) != data:
+            return False
+    return True
+
+
+# JOURNAL
+# =======
+
+# NOTE: every mutation of a ledger is a physical redo entry,
+# ===== i.e. "append these bytes at this offset" or "truncate it here",
+#       which is durable before the ledger itself is touched.
+#       So, only the journal needs an fsync per operation,
+#       while the ledger is synced once per checkpoint.
+
+class Journal:
+    """
+    Record the mutations of a ledger before they are applied,
+    so that an interrupted one can be redone after a crash.
+
+    Every method must be called while holding the ledger's lock.
+
+    >>> journal = Journal('accounts-42.txt')
+    >>> journal.append(ledger, 1319, b'2;631104;Bob;4200\n')
+    >>> journal.truncate(ledger, 1319)
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.journal_path = get_journal_path(filepath)
+        self.journal_file = open(self.journal_path, 'ab')
+
+    def _log(self, entry):
+        self.journal_file.write(entry)
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def append(self, ledger, offset, data):
+        """
+        Append some bytes to an (open) ledger, whose size is 'offset'.
+        """
+
+        self._log(_pack(APPEND, offset, data))
+        ledger.write(data)
+        ledger.flush()
+        self._checkpoint_if_full(ledger)
+
+    def truncate(self, ledger, size):
+        """
+        Truncate an (open) ledger to a given size.
+        """
+
+        self._log(_pack(TRUNCATE, size))
+        ledger.truncate(size)
+        self._checkpoint_if_full(ledger)
+
+    def _checkpoint_if_full(self, ledger):
+        if self.journal_file.tell() > CHECKPOINT_SIZE:
+            self.checkpoint(ledger)
+
+    def checkpoint(self, ledger):
+        """
+        Make an (open) ledger durable, and then empty the journal.
+        This must be done before the ledger is replaced by another file.
+        """
+
+        os.fsync(ledger.fileno())
+        self.journal_file.truncate(0)
+        os.fsync(self.journal_file.fileno())
+
+    def replay(self):
+        """
+        Redo every complete entry of the journal, in order, unless
+        the ledger already reflects them all, discarding a torn one
+        at its end (which was never applied), and then empty it.
+        Return how many entries were redone.
+        """
+
+        with open(self.journal_path, 'rb') as journal_file:
+            entries = list(_iter_entries(journal_file))
+
+        with open(self.filepath, 'rb+') as ledger:
+            is_applied = _is_applied(ledger, entries)
+            if not is_applied:
+                # NOTE: each entry sets the size of the ledger,
+                # ===== so redoing them twice leaves the same bytes.
+                for kind, offset, payload in entries:
+                    ledger.truncate(offset)
+                    if kind == APPEND:
+                        ledger.seek(offset)
+                        ledger.write(payload)
+                ledger.flush()
+                logging.warning("%s entries of %s were redone.",
+                                len(entries), self.journal_path)
+            self.checkpoint(ledger)
+        return 0 if is_applied else len(entries)
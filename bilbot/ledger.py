@@ -0,0 +1,240 @@
+"""
+This module stores Bilbot's ledger interface.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from settings import (LEDGER_BACKEND,
+                      ACCOUNTS,
+                      DATABASE,
+                      CHAT_ACCOUNTS,
+                      CHAT_DATABASE,
+                      CHAT_BINARY)
+
+# pylint: disable=invalid-name
+record = namedtuple('record', ['ppid', 'uuid', 'name', 'amount'])
+user = namedtuple('user', ['uuid', 'name', 'amount', 'count'])
+
+
+# INTERFACE
+# =========
+
+class Ledger(ABC):
+    """
+    Define the operations that every ledger backend must provide.
+
+    A ledger is a sequence of records, where each record is either
+    a withdrawal or a boundary that opens a new purchase period.
+    Boundaries are records whose 'uuid', 'name' and 'amount' are None.
+    A backend that lacks any abstract method can't even be created.
+    """
+
+    @abstractmethod
+    def is_empty(self):
+        """
+        Check whether the ledger holds no records at all.
+        """
+
+    @abstractmethod
+    def get_last_record(self):
+        """
+        Return the most recent record, or None if the ledger is empty.
+
+        >>> ledger.get_last_record()
+        record(ppid='2', uuid=631104, name='Bob', amount=4200)
+        """
+
+    def get_last_ppid(self):
+        """
+        Return the current 'ppid' as a string
+        (aka. the purchase period identifier).
+
+        >>> ledger.get_last_ppid()
+        '2'
+        """
+
+        last_record = self.get_last_record()
+        return last_record.ppid if last_record else ''
+
+    @abstractmethod
+    def get_ppids(self):
+        """
+        Return the 'ppid' of every purchase period, in order.
+
+        >>> ledger.get_ppids()
+        ['1', '2']
+        """
+
+    @abstractmethod
+    def open_period(self, ppid):
+        """
+        Write a boundary that opens a new purchase period.
+        """
+
+    @abstractmethod
+    def withdraw(self, ppid, uuid, name, amount):
+        """
+        Write a new withdrawal within a purchase period.
+
+        >>> ledger.withdraw('2', 631104, 'Bob', 4200)
+        """
+
+    @abstractmethod
+    def list_period(self, ppid, start=0, stop=None):
+        """
+        Yield the withdrawals of a purchase period, in order,
+        from the 'start'-th one up to (but excluding) the 'stop'-th one.
+
+        >>> list(ledger.list_period('2', start=1, stop=2))
+        [record(ppid='2', uuid=314225, name='Alice', amount=650)]
+        """
+
+    def count_period(self, ppid):
+        """
+        Return how many withdrawals a purchase period holds.
+        """
+
+        return sum(user_.count for user_ in self.aggregate_period(ppid))
+
+    @abstractmethod
+    def aggregate_period(self, ppid):
+        """
+        Return the totals of every user within a purchase period.
+
+        >>> ledger.aggregate_period('2')
+        [user(uuid=631104, name='Bob', amount=4200, count=1)]
+        """
+
+    @abstractmethod
+    def total_period(self, ppid):
+        """
+        Return the grand total of a purchase period.
+        """
+
+    @abstractmethod
+    def rollback(self):
+        """
+        Remove the most recent record.
+        """
+
+    @abstractmethod
+    def clear(self):
+        """
+        Remove every record.
+        """
+
+
+# BACKENDS
+# ========
+
+def get_filepath(chat_id, backend=LEDGER_BACKEND):
+    """
+    Return the path of the ledger of a chat.
+
+    >>> get_filepath(-1337, 'csv')
+    '/data/accounts--1337.txt'
+    """
+
+    return TEMPLATES[backend].format(chat_id=chat_id)
+
+
+def _open_ledger(filepath, backend):
+    # NOTE: backends are imported here, since they depend on this module.
+    if backend == 'sqlite':
+        from sqlledger import SQLiteLedger
+        return SQLiteLedger(filepath)
+    if backend == 'binary':
+        from binledger import BinaryLedger
+        return BinaryLedger(filepath)
+
+    from csvledger import CSVLedger
+    return CSVLedger(filepath)
+
+
+def get_ledger(chat_id, backend=LEDGER_BACKEND):
+    """
+    Return the ledger of a chat (for the configured backend),
+    opening it on first use. Every chat has its own storage file,
+    and therefore its own sequence of purchase periods.
+
+    >>> get_ledger(-1337, 'sqlite')
+    <sqlledger.SQLiteLedger object at [...]>
+    """
+
+    key = (backend, chat_id)
+    with _LOCK:
+        if key not in _LEDGERS:
+            _LEDGERS[key] = _open_ledger(get_filepath(chat_id, backend),
+                                         backend)
+        return _LEDGERS[key]
+
+
+def find_legacy():
+    """
+    Return the path of every legacy ledger (shared by every chat)
+    that hasn't been handed over to a chat yet.
+
+    >>> find_legacy()
+    ['/data/accounts.txt']
+    """
+
+    return [legacy_path for legacy_path in LEGACY.values()
+            if os.path.isfile(legacy_path)]
+
+
+def migrate(chat_id, backend=LEDGER_BACKEND):
+    """
+    Hand over the legacy ledger (shared by every chat) to a single chat.
+    Its records hold no chat id, so the file is moved as a whole.
+    Return whether there was anything to migrate.
+
+    >>> migrate(-1337, 'csv')
+    True
+    """
+
+    legacy_path = LEGACY.get(backend)
+    filepath = get_filepath(chat_id, backend)
+    if legacy_path not in find_legacy():
+        return False
+    if os.path.isfile(filepath):
+        raise FileExistsError(MIGRATION_CONFLICT.format(filepath=filepath))
+
+    # the sidecars (or the WAL files) follow their ledger.
+    root, _ = os.path.splitext(legacy_path)
+    new_root, _ = os.path.splitext(filepath)
+    for template in SIDECARS[backend]:
+        old_sidecar = template.format(root=root, path=legacy_path)
+        if os.path.isfile(old_sidecar):
+            os.rename(old_sidecar,
+                      template.format(root=new_root, path=filepath))
+    os.rename(legacy_path, filepath)
+    return True
+
+
+# TEMPLATES
+# =========
+
+MIGRATION_CONFLICT = "{filepath} already exists; the ledger was not migrated."
+LEGACY = {
+    'csv': ACCOUNTS,
+    'sqlite': DATABASE,
+}
+TEMPLATES = {
+    'csv': CHAT_ACCOUNTS,
+    'sqlite': CHAT_DATABASE,
+    'binary': CHAT_BINARY,
+}
+SIDECARS = {
+    'csv': ('{root}.idx', '{root}.agg', '{path}.journal'),
+    'sqlite': ('{path}-wal', '{path}-shm'),
+}
+
+_LOCK = threading.Lock()
+_LEDGERS = {}  # the opened ledgers, indexed by their backend and chat.
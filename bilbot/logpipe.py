@@ -0,0 +1,104 @@
+"""
+This module stores Bilbot's logging pipeline.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+
+from logging.handlers import QueueHandler, QueueListener
+
+# the fields that a command adds to its record, through 'extra'.
+FIELDS = ('user', 'command', 'chat', 'outcome', 'duration')
+
+
+# FORMATTERS
+# ==========
+
+class JSONFormatter(logging.Formatter):
+    """
+    Format every record as a compact JSON object, on a single line.
+
+    >>> JSONFormatter().format(record)
+    '{"time":"21/Oct 16:29:03","level":"INFO","user":"Alice",[...]}'
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+        }
+        for field in FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        entry['message'] = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+
+# HANDLERS
+# ========
+
+class RecordQueueHandler(QueueHandler):
+    """
+    Enqueue every record with its message already merged,
+    but keeping its traceback apart (as text), so that each
+    formatter still decides where (and how) to write it.
+
+    >>> root.addHandler(RecordQueueHandler(records))
+    """
+
+    _formatter = logging.Formatter()
+
+    def prepare(self, record):
+        # NOTE: the traceback itself can't be pickled (nor safely kept
+        # ===== once the frames are gone), but its text can.
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._formatter.formatException(
+                record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+# PIPELINE
+# ========
+
+def start(filename, style, fmt, datefmt):
+    """
+    Route every log record through a queue, so that the callers
+    only enqueue it, while a background listener writes it to disk.
+    Return the listener, which is also stopped (and flushed) at exit.
+
+    >>> start('bilbot.log', 'json', LOGFORMAT, '%d/%b %H:%M:%S')
+    <logging.handlers.QueueListener object at 0x7f2a6c1d3e10>
+    """
+
+    if style == 'json':
+        formatter = JSONFormatter(datefmt=datefmt)
+    else:
+        formatter = logging.Formatter(fmt, datefmt, style='{')
+
+    file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(formatter)
+
+    records = queue.Queue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(RecordQueueHandler(records))
+
+    listener = QueueListener(records, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -26,6 +26,12 @@ ERROR = Namespace(**{
     'NONPOSITIVE_AMOUNT': "El argumento debe ser estrictamente positivo.",
     'UNREALISTIC_AMOUNT': "El argumento no es suficientemente razonable.",
     'NO_STORED_ACCOUNTS': "No hay registros disponibles.",
+    'WRONG_PAGE':         "La página `{page}` no existe.",
+    'EMPTY_PERIOD':       "El periodo `{ppid}` no tiene registros.",
+    'EMPTY_HISTORY':      "No hay periodos en ese rango, terrícola.",
+    'LONG_HISTORY':       "Sólo puedo resumir {limit} periodos a la vez.",
+    'NO_STATS':           "Aún no tengo estadísticas, terrícola.",
+    'NOT_ADMIN':          "Lo lamento, {user}. Sólo obedezco a mis creadores.",
 
     'UNKNOWN_COMMAND': dedent("""
                        El comando `{command}` no existe.
@@ -78,4 +84,22 @@ INFO = Namespace(**{
                  *{amount}* pesos chilenos.
                  """),
     'POST_AGGREGATE_LIST': "Además, si agregamos por cada humano...",
+    'LIST_PAGE': "(Página {page} de {pages}.)",
+    'NEXT_PAGE': "Escribe `{command} page {page}` para ver la siguiente.",
+
+    'ANTE_HISTORY': "Déjame hacer un poco de historia...",
+    'EACH_HISTORY': "• En el periodo `{ppid}` se sacaron ${amount}.",
+    'POST_HISTORY': dedent("""
+                    Todo esto suma un gran total de *{amount}* pesos chilenos.
+                    Y si agregamos por cada humano...
+                    """),
+
+    'ANTE_TOP': "Estos son los humanos que más han sacado...",
+    'EACH_TOP': "{place}. {user} sacó ${amount}, en {count} compras "
+                "(${mean} en promedio).",
+
+    'ANTE_STATS': "Esto es lo que he medido hasta ahora...",
+    'EACH_STATS': ("• `{command}`: {count} veces "
+                   "({errors} errores, {rejections} rechazos); "
+                   "promedio de {mean}, p50 de {p50} y p95 de {p95}."),
 })
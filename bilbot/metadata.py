@@ -0,0 +1,14 @@
+"""
+This module stores Bilbot's metadata.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+# NOTE: these live apart from 'bilbot.py', since importing that one
+# ===== from any other module would load it twice (once as '__main__').
+
+__AUTHOR__ = 'Nebil Kawas García'
+__LICENSE__ = 'MPL-2.0'
+__VERSION__ = '0.3.0'
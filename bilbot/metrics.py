@@ -0,0 +1,201 @@
+"""
+This module stores Bilbot's metrics.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import bisect
+import logging
+import threading
+
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# the upper bounds (in seconds) of the latency buckets.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# pylint: disable=invalid-name
+summary = namedtuple('summary', ['command', 'count', 'errors',
+                                 'rejections', 'mean', 'p50', 'p95'])
+
+
+# USEFUL CLASSES
+# ====== =======
+
+class Histogram:
+    """
+    Count the observed values within fixed buckets,
+    keeping also their sum (in order to compute their mean).
+
+    >>> histogram = Histogram()
+    >>> histogram.observe(0.003)
+    >>> histogram.quantile(0.5)
+    0.005
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last one is '+Inf'.
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, fraction):
+        """
+        Return the upper bound of the bucket holding that quantile.
+        """
+
+        rank, seen = fraction * self.count, 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+# REGISTRY
+# ========
+
+class Registry:
+    """
+    Keep a counter for every command, outcome and chat,
+    and a latency histogram for every command and outcome.
+
+    >>> METRICS.observe('list', 'ok', -1337, 0.004)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def observe(self, command, outcome, chat_id, duration):
+        with self.lock:
+            key = (command, outcome, chat_id)
+            self.counters[key] = self.counters.get(key, 0) + 1
+            histogram = self.histograms.setdefault((command, outcome),
+                                                   Histogram())
+            histogram.observe(duration)
+
+    def summarize(self):
+        """
+        Summarize the metrics of every command, over every chat.
+
+        >>> METRICS.summarize()
+        [summary(command='list', count=2, errors=0, rejections=0, [...])]
+        """
+
+        with self.lock:
+            histograms = {}
+            rejected, failed = {}, {}
+            for (command, outcome), histogram in self.histograms.items():
+                merged = histograms.setdefault(command, Histogram())
+                merged.merge(histogram)
+                if outcome == 'not_authorized':
+                    rejected[command] = histogram.count
+                elif outcome == 'error':
+                    failed[command] = histogram.count
+
+        return [summary(command=command,
+                        count=histogram.count,
+                        errors=failed.get(command, 0),
+                        rejections=rejected.get(command, 0),
+                        mean=histogram.sum / histogram.count,
+                        p50=histogram.quantile(0.5),
+                        p95=histogram.quantile(0.95))
+                for command, histogram in sorted(histograms.items())]
+
+    def render(self):
+        """
+        Render every metric in Prometheus' text exposition format.
+
+        >>> print(METRICS.render())
+        # TYPE bilbot_commands_total counter
+        bilbot_commands_total{command="list",outcome="ok",chat="-1337"} 2
+        [...]
+        """
+
+        lines = ['# TYPE bilbot_commands_total counter']
+        with self.lock:
+            for key, value in sorted(self.counters.items(), key=str):
+                labels = CHAT_LABELS.format(*key)
+                lines.append(COUNTER_LINE.format(labels, value))
+
+            lines.append('# TYPE bilbot_command_seconds histogram')
+            for (command, outcome), histogram in sorted(
+                    self.histograms.items()):
+                labels = LABELS.format(command, outcome)
+                seen, bounds = 0, [str(bound) for bound in BUCKETS] + ['+Inf']
+                for bound, count in zip(bounds, histogram.counts):
+                    seen += count
+                    lines.append(BUCKET_LINE.format(labels, bound, seen))
+                lines.append(SUM_LINE.format(labels, histogram.sum))
+                lines.append(COUNT_LINE.format(labels, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+# ENDPOINT
+# ========
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serve the metrics to a Prometheus scraper.
+    """
+
+    # pylint: disable=invalid-name
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = METRICS.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # pylint: disable=redefined-builtin
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+def serve(port, host='127.0.0.1'):
+    """
+    Expose the metrics at 'http://127.0.0.1:<port>/metrics',
+    from a background thread. Return the server.
+    """
+
+    server = HTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever,
+                              name='metrics', daemon=True)
+    thread.start()
+    return server
+
+
+# TEMPLATES
+# =========
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LABELS = 'command="{}",outcome="{}"'
+CHAT_LABELS = 'command="{}",outcome="{}",chat="{}"'
+COUNTER_LINE = 'bilbot_commands_total{{{}}} {}'
+BUCKET_LINE = 'bilbot_command_seconds_bucket{{{},le="{}"}} {}'
+SUM_LINE = 'bilbot_command_seconds_sum{{{}}} {}'
+COUNT_LINE = 'bilbot_command_seconds_count{{{}}} {}'
+
+METRICS = Registry()
@@ -0,0 +1,230 @@
+"""
+This module stores Bilbot's outbound message scheduler.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import logging
+import threading
+import time
+
+from collections import OrderedDict, deque
+
+from telegram.error import (BadRequest, NetworkError, RetryAfter,
+                            TelegramError)
+
+# Telegram's limits: one message per second within a chat,
+# thirty messages per second overall, and 4096 characters per message.
+MESSAGE_LIMIT = 4096
+CHAT_RATE, CHAT_BURST = 1, 3
+GLOBAL_RATE, GLOBAL_BURST = 30, 30
+
+MAX_ATTEMPTS = 5
+BACKOFF = 0.5  # in seconds, doubled after every failed attempt.
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def chunk(text, limit=MESSAGE_LIMIT):
+    """
+    Split a text into pieces that fit into a single message,
+    cutting on line boundaries (unless a line is too long by itself).
+
+    >>> chunk('seis\nsiete\nocho', limit=10)
+    ['seis\nsiete', 'ocho']
+    """
+
+    pieces, current = [], ''
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if current: pieces.append(current)
+            pieces.append(line[:limit])
+            current, line = '', line[limit:]
+        if not current:
+            current = line
+        elif len(current) + 1 + len(line) <= limit:
+            current = '{}\n{}'.format(current, line)
+        else:
+            pieces.append(current)
+            current = line
+    return pieces + [current]
+
+
+# USEFUL CLASSES
+# ====== =======
+
+class TokenBucket:
+    """
+    Allow 'rate' events per second, with bursts of up to 'burst' events.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.stamp
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.stamp = now
+
+    def delay(self, now):
+        """
+        Return how long to wait until an event is allowed.
+        """
+
+        self._refill(now)
+        return max(0, (1 - self.tokens) / self.rate)
+
+    def take(self, now):
+        """
+        Spend a token on an event.
+        """
+
+        self._refill(now)
+        self.tokens -= 1
+
+
+# SCHEDULER
+# =========
+
+class Outbox:
+    """
+    Queue the outgoing messages and send them from a background thread,
+    so the handlers never wait for Telegram.
+
+    Oversized texts are chunked, consecutive texts for the same chat
+    are merged, every chat (and the bot as a whole) is paced with
+    token buckets, and flood-wait or network errors are retried.
+
+    >>> OUTBOX.put(bot, chat_id, 'Bilbot, operativo.')
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.chats = OrderedDict()  # the pending messages of every chat.
+        self.buckets = {}
+        self.bucket = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self.thread = None
+        self.sending = False
+
+    def put(self, bot, chat_id, text, **kwargs):
+        """
+        Queue a text to be sent to a chat.
+        """
+
+        pieces = [piece for piece in chunk(text) if piece]
+        if not pieces:
+            return
+
+        with self.condition:
+            messages = self.chats.setdefault(chat_id, deque())
+            for piece in pieces:
+                last = messages[-1] if messages else None
+                length = len(last['text']) + 1 + len(piece) if last else 0
+                if last and last['kwargs'] == kwargs and \
+                        length <= MESSAGE_LIMIT:
+                    last['text'] = '{}\n{}'.format(last['text'], piece)
+                else:
+                    messages.append({'bot': bot, 'text': piece,
+                                     'kwargs': kwargs})
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run,
+                                               name='outbox', daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def flush(self, timeout):
+        """
+        Wait (up to 'timeout' seconds) until every queued message is sent.
+        Return whether the outbox was emptied.
+        """
+
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.chats or self.sending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            return True
+
+    def _get_bucket(self, chat_id):
+        if chat_id not in self.buckets:
+            self.buckets[chat_id] = TokenBucket(CHAT_RATE, CHAT_BURST)
+        return self.buckets[chat_id]
+
+    def _next(self):
+        """
+        Wait until some chat is allowed to receive its next message,
+        taking turns between chats, and return that message.
+        """
+
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                timeout = None
+                for chat_id, messages in self.chats.items():
+                    bucket = self._get_bucket(chat_id)
+                    delay = max(bucket.delay(now), self.bucket.delay(now))
+                    if delay == 0:
+                        break
+                    timeout = min(delay, timeout or delay)
+                else:
+                    self.condition.wait(timeout)
+                    continue
+
+                message = messages.popleft()
+                if messages:
+                    self.chats.move_to_end(chat_id)
+                else:
+                    del self.chats[chat_id]
+                bucket.take(now)
+                self.bucket.take(now)
+                self.sending = True
+                return chat_id, message
+
+    @staticmethod
+    def _deliver(chat_id, message):
+        """
+        Send a message, retrying whenever Telegram asks us to.
+        Any other error (e.g. the bot was kicked) only drops the message.
+        """
+
+        bot, text, kwargs = message['bot'], message['text'], message['kwargs']
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                bot.sendMessage(chat_id, text, **kwargs)
+                return
+            except RetryAfter as error:
+                time.sleep(error.retry_after)
+            except BadRequest:
+                break
+            except NetworkError:
+                time.sleep(BACKOFF * 2 ** attempt)
+            except TelegramError as error:
+                logging.error("A message to %s was rejected: %s",
+                              chat_id, error)
+                return
+        logging.error("A message to %s could not be delivered.", chat_id)
+
+    def _run(self):
+        while True:
+            chat_id, message = self._next()
+            # NOTE: this is the only sender, so it must outlive any error.
+            try:
+                self._deliver(chat_id, message)
+            # pylint: disable=broad-except
+            except Exception:
+                logging.exception("A message to %s was dropped.", chat_id)
+            with self.condition:
+                self.sending = False
+                self.condition.notify_all()
+
+
+OUTBOX = Outbox()
@@ -0,0 +1,110 @@
+"""
+This module stores Bilbot's command router.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import inspect
+
+from collections import namedtuple
+from functools import wraps
+
+from telegram.ext import Handler
+
+# pylint: disable=invalid-name
+route = namedtuple('route', ['callback', 'pass_args'])
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def get_routes(commands):
+    """
+    Return the route of every command, indexed by its name,
+    knowing beforehand whether it takes any arguments.
+
+    >>> get_routes({'list': list_command})
+    {'list': route(callback=<function list_command at [...]>,
+                   pass_args=True)}
+    """
+
+    return {name: _get_route(callback)
+            for name, callback in commands.items()}
+
+
+def _get_route(callback):
+    has_args = 'args' in inspect.signature(callback).parameters
+    return route(callback, has_args)
+
+
+def parse(text):
+    """
+    Split a command into its name, the bot it mentions (if any)
+    and its arguments, in a single pass over the text.
+
+    >>> parse('/list@nebilbot page 2')
+    ('list', 'nebilbot', ['page', '2'])
+
+    >>> parse('/about')
+    ('about', None, [])
+    """
+
+    command, *args = text.split()
+    name, _, mention = command[1:].partition('@')
+    return name, mention or None, args
+
+
+# HANDLERS
+# ========
+
+class CommandRouter(Handler):
+    """
+    Handle every command with a single handler, which parses it once
+    and finds its callback in a dictionary, instead of trying one
+    handler per command; the unknown ones go to the fallback.
+
+    Callbacks run on the executor, keeping the order of every chat,
+    and 'on_done' (if any) is called with the update once it's handled.
+
+    >>> router = CommandRouter(COMMANDS, unknown, executor)
+    >>> dispatcher.add_handler(router)
+    """
+
+    def __init__(self, commands, fallback, executor, on_done=None):
+        super().__init__(fallback)
+        self.routes = get_routes(commands)
+        self.fallback = _get_route(fallback)
+        self.executor = executor
+        self.on_done = on_done
+
+    def check_update(self, update):
+        message = getattr(update, 'message', None)
+        text = message and message.text
+        return bool(text and text.startswith('/'))
+
+    def handle_update(self, update, dispatcher):
+        name, mention, args = parse(update.message.text)
+
+        # in a group, a command may be meant for another bot.
+        if mention and mention.lower() != dispatcher.bot.username.lower():
+            return
+
+        route_ = self.routes.get(name, self.fallback)
+        kwargs = {'args': args} if route_.pass_args else {}
+        callback = route_.callback
+        if self.on_done:
+            callback = self._finishing(callback, update)
+        update.routed = True
+        self.executor.submit(update.message.chat_id, callback,
+                             dispatcher.bot, update, **kwargs)
+
+    def _finishing(self, callback, update):
+        @wraps(callback)
+        def wrapper(*args, **kwargs):
+            try:
+                callback(*args, **kwargs)
+            finally:
+                self.on_done(update)
+        return wrapper
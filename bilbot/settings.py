@@ -6,7 +6,10 @@ This source code is subject to the terms of the Mozilla Public License.
 You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
 """
 
+import logging
 import os
+import threading
+import time
 from collections import namedtuple
 
 
@@ -30,6 +33,20 @@ def _is_useful(line):
     return not (is_empty or is_comment)
 
 
+def _to_chat_id(value):
+    """
+    Parse a chat id, or return None if it's not a valid one.
+
+    >>> _to_chat_id('-1337')
+    -1337
+    """
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 def _select_filename(basename):
     """
     Return the absolute path of a particular file,
@@ -75,6 +92,21 @@ MIN_GT_MAX_VALUES = ("\nThe minimum value ({min:,}) cannot be greater than "
                      "\nthe maximum value ({max:,})."
                      "\nPlease, adjust these values.")
 
+MISSING_SECRET = ("\nThe webhook secret is missing."
+                  "\nPlease, declare a secret path in the configuration file.")
+
+UNKNOWN_MODE = ("\n{mode} is not a valid mode."
+                "\nPlease, choose one of these: {modes}.")
+
+UNKNOWN_LOG_STYLE = ("\n{style} is not a valid log format."
+                     "\nPlease, choose one of these: {styles}.")
+
+UNKNOWN_BACKEND = ("\n{backend} is not a valid ledger backend."
+                   "\nPlease, choose one of these: {backends}.")
+
+INVALID_CHAT_ID = ("\n{chat} is not a valid chat id."
+                   "\nPlease, declare the legacy chat as an integer.")
+
 
 # SETTINGS
 # ========
@@ -82,12 +114,22 @@ MIN_GT_MAX_VALUES = ("\nThe minimum value ({min:,}) cannot be greater than "
 LOG_DIR = os.getenv('OPENSHIFT_LOG_DIR', '.')
 LOGFILE = os.path.join(LOG_DIR, 'bilbot.log')
 DATA_DIR = os.getenv('OPENSHIFT_DATA_DIR', '.')
-ACCOUNTS = os.path.join(DATA_DIR, 'accounts.txt')
+ACCOUNTS = os.path.join(DATA_DIR, 'accounts.txt')  # shared by every chat.
+DATABASE = os.path.join(DATA_DIR, 'accounts.db')  # shared by every chat.
+CHAT_ACCOUNTS = os.path.join(DATA_DIR, 'accounts-{chat_id}.txt')
+CHAT_DATABASE = os.path.join(DATA_DIR, 'accounts-{chat_id}.db')
+CHAT_BINARY = os.path.join(DATA_DIR, 'accounts-{chat_id}.bin')
+UPDATES = os.path.join(DATA_DIR, 'updates.bin')  # the processed ones.
+LEDGER_BACKENDS = ('csv', 'sqlite', 'binary')
+MODES = ('polling', 'webhook')
+LOG_STYLES = ('banner', 'json')
 
 FIELD_DELIMITER = ';'
 GROUP_DELIMITER = '='
 CONFIG_FILENAME = 'bilbot.cfg'
-SELECTED_CONFIG = _select_filename(CONFIG_FILENAME)
+# NOTE: another configuration file can be chosen (e.g. by the tests).
+CHOSEN_CONFIG = os.getenv('BILBOT_CONFIG')
+SELECTED_CONFIG = CHOSEN_CONFIG or _select_filename(CONFIG_FILENAME)
 
 CSV_KWARGS = {
     'delimiter': FIELD_DELIMITER,
@@ -98,33 +140,160 @@ LOGFORMAT = ("\n{asctime}\n"
              "====== ========\n"
              "({levelname}) {message}\n")
 
+RELOAD_INTERVAL = 1  # in seconds, between two checks of the config file.
+
 
-with open(SELECTED_CONFIG) as cfgfile:
-    CONFIG_DICT = dict(line.rstrip().split('=')
-                       for line in cfgfile
-                       if _is_useful(line))
+# pylint: disable=invalid-name
+error = namedtuple('error', ['message', 'kwargs'])
+snapshot = namedtuple('snapshot', ['whitelist',
+                                   'admins',
+                                   'min_amount',
+                                   'max_amount',
+                                   'list_page_size'])
 
-    BOT_TOKEN = CONFIG_DICT.get('bot_token')
-    WHITELIST = CONFIG_DICT.get('whitelist')
-    MIN_AMOUNT = int(CONFIG_DICT.get('min_withdrawal') or 500)
-    MAX_AMOUNT = int(CONFIG_DICT.get('max_withdrawal') or 100000)
 
-    # pylint: disable=invalid-name
-    error = namedtuple('error', ['message', 'kwargs'])
+# SNAPSHOTS
+# =========
 
-    EXCEPTIONS = {
-        not BOT_TOKEN:
-        error(MISSING_BOT_TOKEN, {}),
+def _read_config(filepath):
+    """
+    Read a configuration file into a dictionary.
+
+    >>> _read_config('bilbot.cfg')
+    {'bot_token': '<bilbot-token>', [...]}
+    """
 
-        MIN_AMOUNT < 1:
-        error(NONPOSITIVE_VALUE, {'amount': MIN_AMOUNT, 'm__': 'min'}),
+    with open(filepath) as cfgfile:
+        return dict(line.rstrip().split('=', 1)
+                    for line in cfgfile
+                    if _is_useful(line))
+
+
+def _raise_errors(checks):
+    """
+    Raise the first error whose check holds.
+    """
 
-        MAX_AMOUNT < 1:
-        error(NONPOSITIVE_VALUE, {'amount': MAX_AMOUNT, 'm__': 'max'}),
+    for check, error_ in checks:
+        if check: raise Exception(error_.message.format(**error_.kwargs))
 
-        MIN_AMOUNT > MAX_AMOUNT:
-        error(MIN_GT_MAX_VALUES, {'min': MIN_AMOUNT, 'max': MAX_AMOUNT}),
-    }
 
-    for check, error in EXCEPTIONS.items():
-        if check: raise Exception(error.message.format(**error.kwargs))
+def _take_snapshot(config_dict):
+    """
+    Build (and validate) the settings that can change while running.
+    The whitelist is parsed into a set, or None to allow every chat.
+
+    >>> _take_snapshot({'whitelist': '42,-1337'})
+    snapshot(whitelist=frozenset({'42', '-1337'}), admins=frozenset(), [...])
+    """
+
+    whitelist = config_dict.get('whitelist')
+    admins = config_dict.get('admins') or ''
+    snapshot_ = snapshot(
+        whitelist=(None if whitelist is None else
+                   frozenset(whitelist.split(','))),
+        admins=frozenset(filter(None, admins.split(','))),
+        min_amount=int(config_dict.get('min_withdrawal') or 500),
+        max_amount=int(config_dict.get('max_withdrawal') or 100000),
+        list_page_size=int(config_dict.get('list_page_size') or 20),
+    )
+
+    min_amount, max_amount = snapshot_.min_amount, snapshot_.max_amount
+    _raise_errors([
+        (min_amount < 1,
+         error(NONPOSITIVE_VALUE, {'amount': min_amount, 'm__': 'min'})),
+
+        (max_amount < 1,
+         error(NONPOSITIVE_VALUE, {'amount': max_amount, 'm__': 'max'})),
+
+        (min_amount > max_amount,
+         error(MIN_GT_MAX_VALUES, {'min': min_amount, 'max': max_amount})),
+    ])
+    return snapshot_
+
+
+def reload():
+    """
+    Read the configuration file again and swap the current snapshot.
+    If the new settings are not valid, the current ones are kept.
+    """
+
+    global _SNAPSHOT, _MTIME  # pylint: disable=global-statement
+    with _RELOAD_LOCK:
+        try:
+            _MTIME = os.path.getmtime(SELECTED_CONFIG)
+            _SNAPSHOT = _take_snapshot(_read_config(SELECTED_CONFIG))
+            logging.info("The settings have been reloaded.")
+        # pylint: disable=broad-except
+        except Exception:
+            logging.exception("The settings could not be reloaded.")
+
+
+def get_snapshot():
+    """
+    Return the current settings, reloading them first
+    if the configuration file has changed on disk.
+
+    >>> get_snapshot().max_amount
+    100000
+    """
+
+    global _CHECKED  # pylint: disable=global-statement
+    now = time.monotonic()
+    if now - _CHECKED >= RELOAD_INTERVAL:
+        _CHECKED = now
+        try:
+            is_modified = os.path.getmtime(SELECTED_CONFIG) != _MTIME
+        except OSError:
+            is_modified = False
+        if is_modified: reload()
+    return _SNAPSHOT
+
+
+CONFIG_DICT = _read_config(SELECTED_CONFIG)
+
+BOT_TOKEN = CONFIG_DICT.get('bot_token')
+LOG_STYLE = CONFIG_DICT.get('log_format') or 'banner'
+LEDGER_BACKEND = CONFIG_DICT.get('ledger_backend') or 'csv'
+LEGACY_CHAT = _to_chat_id(CONFIG_DICT.get('legacy_chat'))
+COMMIT_WINDOW = int(CONFIG_DICT.get('commit_window_ms') or 2) / 1000
+WORKERS = int(CONFIG_DICT.get('workers') or 4)
+QUEUE_DEPTH = int(CONFIG_DICT.get('queue_depth') or 64)
+DEDUP_SIZE = int(CONFIG_DICT.get('dedup_size') or 4096)
+
+MODE = CONFIG_DICT.get('mode') or 'polling'
+WEBHOOK_URL = CONFIG_DICT.get('webhook_url')
+WEBHOOK_LISTEN = CONFIG_DICT.get('webhook_listen') or '127.0.0.1'
+WEBHOOK_PORT = int(CONFIG_DICT.get('webhook_port') or 8443)
+WEBHOOK_SECRET = CONFIG_DICT.get('webhook_secret')
+WEBHOOK_TOKEN = CONFIG_DICT.get('webhook_token')
+METRICS_PORT = int(CONFIG_DICT.get('metrics_port') or 0)  # zero: disabled.
+
+_raise_errors([
+    (not BOT_TOKEN,
+     error(MISSING_BOT_TOKEN, {})),
+
+    (LOG_STYLE not in LOG_STYLES,
+     error(UNKNOWN_LOG_STYLE, {'style': LOG_STYLE,
+                               'styles': ', '.join(LOG_STYLES)})),
+
+    (MODE not in MODES,
+     error(UNKNOWN_MODE, {'mode': MODE, 'modes': ', '.join(MODES)})),
+
+    (MODE == 'webhook' and not WEBHOOK_SECRET,
+     error(MISSING_SECRET, {})),
+
+    (LEDGER_BACKEND not in LEDGER_BACKENDS,
+     error(UNKNOWN_BACKEND, {'backend': LEDGER_BACKEND,
+                             'backends': ', '.join(LEDGER_BACKENDS)})),
+
+    (CONFIG_DICT.get('legacy_chat') and LEGACY_CHAT is None,
+     error(INVALID_CHAT_ID, {'chat': CONFIG_DICT.get('legacy_chat')})),
+])
+
+# NOTE: the snapshot is swapped as a whole, so readers never see
+# ===== a half-updated configuration (and need no lock at all).
+_RELOAD_LOCK = threading.Lock()
+_MTIME = os.path.getmtime(SELECTED_CONFIG)
+_CHECKED = time.monotonic()
+_SNAPSHOT = _take_snapshot(CONFIG_DICT)
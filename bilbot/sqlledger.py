@@ -0,0 +1,149 @@
+"""
+This module stores Bilbot's SQLite ledger.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import sqlite3
+import threading
+from argparse import Namespace
+
+from ledger import Ledger, record, user
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def _to_ppid(ppid):
+    """
+    Return a 'ppid' as it is handed over by the ledger interface.
+    Withdrawals made before opening any period are stored with zero.
+
+    >>> _to_ppid(3)
+    '3'
+
+    >>> _to_ppid(0)
+    ''
+    """
+
+    return str(ppid) if ppid else ''
+
+
+# BACKEND
+# =======
+
+class SQLiteLedger(Ledger):
+    """
+    Store the records in an SQLite database, using a single table
+    (indexed on 'ppid' and 'uuid') where boundaries have a NULL 'uuid'.
+    """
+
+    def __init__(self, filepath):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filepath, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(SQL.WAL_MODE)
+            self.connection.execute(SQL.SYNCHRONOUS)
+            self.connection.executescript(SQL.SCHEMA)
+
+    def _fetch(self, query, *params):
+        with self.lock:
+            return self.connection.execute(query, params).fetchall()
+
+    def _execute(self, query, *params):
+        with self.lock, self.connection:
+            self.connection.execute(query, params)
+
+    def is_empty(self):
+        return not self._fetch(SQL.ANY_RECORD)
+
+    def get_last_record(self):
+        rows = self._fetch(SQL.LAST_RECORD)
+        if not rows:
+            return None
+        ppid, *rest = rows[0]
+        return record(_to_ppid(ppid), *rest)
+
+    def get_ppids(self):
+        return [_to_ppid(ppid) for ppid, in self._fetch(SQL.PPIDS)]
+
+    def open_period(self, ppid):
+        self._execute(SQL.INSERT_BOUNDARY, int(ppid))
+
+    def withdraw(self, ppid, uuid, name, amount):
+        self._execute(SQL.INSERT_WITHDRAWAL,
+                      int(ppid or 0), uuid, name, amount)
+
+    def list_period(self, ppid, start=0, stop=None):
+        limit = -1 if stop is None else max(stop - start, 0)
+        rows = self._fetch(SQL.LIST_PERIOD, int(ppid or 0), limit, start)
+        for _, *rest in rows:
+            yield record(ppid, *rest)
+
+    def aggregate_period(self, ppid):
+        rows = self._fetch(SQL.AGGREGATE_PERIOD, int(ppid or 0))
+        return [user(*row) for *row, _ in rows]
+
+    def total_period(self, ppid):
+        (total,), = self._fetch(SQL.TOTAL_PERIOD, int(ppid or 0))
+        return total
+
+    def rollback(self):
+        self._execute(SQL.DELETE_LAST)
+
+    def clear(self):
+        self._execute(SQL.DELETE_ALL)
+
+
+# QUERIES
+# =======
+
+SQL = Namespace(**{
+    'WAL_MODE': "PRAGMA journal_mode=WAL",
+    'SYNCHRONOUS': "PRAGMA synchronous=NORMAL",
+    'SCHEMA': """
+        CREATE TABLE IF NOT EXISTS records (
+            id     INTEGER PRIMARY KEY,
+            ppid   INTEGER NOT NULL,
+            uuid   INTEGER,
+            name   TEXT,
+            amount INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS records_by_ppid
+            ON records (ppid, uuid);
+        CREATE INDEX IF NOT EXISTS records_by_uuid
+            ON records (uuid);
+        """,
+
+    'ANY_RECORD': "SELECT 1 FROM records LIMIT 1",
+    'LAST_RECORD': """
+        SELECT ppid, uuid, name, amount
+        FROM records ORDER BY id DESC LIMIT 1
+        """,
+    'PPIDS': "SELECT DISTINCT ppid FROM records ORDER BY ppid",
+    'INSERT_BOUNDARY': "INSERT INTO records (ppid) VALUES (?)",
+    'INSERT_WITHDRAWAL': """
+        INSERT INTO records (ppid, uuid, name, amount) VALUES (?, ?, ?, ?)
+        """,
+    'LIST_PERIOD': """
+        SELECT ppid, uuid, name, amount
+        FROM records WHERE ppid = ? AND uuid IS NOT NULL ORDER BY id
+        LIMIT ? OFFSET ?
+        """,
+
+    # NOTE: SQLite takes the bare 'name' from the row holding MAX(id).
+    'AGGREGATE_PERIOD': """
+        SELECT uuid, name, SUM(amount), COUNT(*), MAX(id)
+        FROM records WHERE ppid = ? AND uuid IS NOT NULL
+        GROUP BY uuid ORDER BY MIN(id)
+        """,
+    'TOTAL_PERIOD': """
+        SELECT COALESCE(SUM(amount), 0) FROM records WHERE ppid = ?
+        """,
+    'DELETE_LAST': """
+        DELETE FROM records WHERE id = (SELECT MAX(id) FROM records)
+        """,
+    'DELETE_ALL': "DELETE FROM records",
+})
@@ -0,0 +1,218 @@
+"""
+This module stores Bilbot's webhook listener.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+
+Recorded updates (one JSON object per line) can be replayed locally,
+against a running listener, with...
+$ python3 bilbot/webhook.py updates.jsonl
+"""
+
+import hmac
+import json
+import logging
+import sys
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.request import Request, urlopen
+
+from settings import (WEBHOOK_LISTEN,
+                      WEBHOOK_PORT,
+                      WEBHOOK_SECRET,
+                      WEBHOOK_TOKEN,
+                      WEBHOOK_URL)
+
+TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+# USEFUL FUNCTIONS
+# ====== =========
+
+def _is_same(given, expected):
+    """
+    Compare two secrets in constant time.
+
+    >>> _is_same('s3cr3t', 's3cr3t')
+    True
+    """
+
+    return hmac.compare_digest(given.encode(), expected.encode())
+
+
+def get_webhook_url():
+    """
+    Return the public URL that Telegram must POST the updates to.
+
+    >>> get_webhook_url()
+    'https://bilbot.example.com/s3cr3t'
+    """
+
+    return '{}/{}'.format(WEBHOOK_URL.rstrip('/'), WEBHOOK_SECRET)
+
+
+# LISTENER
+# ========
+
+class _UpdateHandler(BaseHTTPRequestHandler):
+    """
+    Accept an update payload, check its secrets
+    and put it into the queue of the dispatcher.
+    """
+
+    def _is_authorized(self):
+        path = self.path.strip('/')
+        token = self.headers.get(TOKEN_HEADER, '')
+        is_right_path = _is_same(path, WEBHOOK_SECRET)
+        is_right_token = not WEBHOOK_TOKEN or _is_same(token, WEBHOOK_TOKEN)
+        return is_right_path and is_right_token
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _read_update(self):
+        """
+        Return the update sent in the body of the request,
+        or None if the body isn't a JSON object.
+        """
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(max(length, 0))
+            payload = json.loads(body.decode('utf-8'))
+        except ValueError:
+            return None
+        if not isinstance(payload, dict):
+            return None
+        return self.server.Update.de_json(payload, self.server.bot)
+
+    # pylint: disable=invalid-name
+    def do_POST(self):
+        if not self._is_authorized():
+            self._reply(403)
+            return
+
+        update = self._read_update()
+        if update is None:
+            self._reply(400)
+            return
+
+        self.server.update_queue.put(update)
+        self._reply(200)
+
+    # pylint: disable=redefined-builtin
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+class WebhookServer(ThreadingMixIn, HTTPServer):
+    """
+    Listen for updates, feeding the very same dispatcher
+    that 'start_polling' would have fed.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, updater, address=(WEBHOOK_LISTEN, WEBHOOK_PORT)):
+        # NOTE: telegram is imported here, so replaying doesn't need it.
+        from telegram import Update
+
+        super().__init__(address, _UpdateHandler)
+        self.Update = Update  # pylint: disable=invalid-name
+        self.bot = updater.bot
+        self.update_queue = updater.update_queue
+
+
+def start(updater):
+    """
+    Start the dispatcher and the listener, in background threads,
+    and ask Telegram to deliver the updates through the webhook.
+    Return the server, to be able to shut it down later.
+    """
+
+    dispatcher = threading.Thread(target=updater.dispatcher.start,
+                                  name='dispatcher', daemon=True)
+    dispatcher.start()
+
+    server = WebhookServer(updater)
+    listener = threading.Thread(target=server.serve_forever,
+                                name='webhook', daemon=True)
+    listener.start()
+
+    if WEBHOOK_URL:
+        register(updater.bot)
+
+    # NOTE: on SIGINT or SIGTERM, 'updater.idle' stops a running updater
+    # ===== (and otherwise, it exits at once, skipping every cleanup).
+    updater.running = True
+    updater.stop = lambda: shutdown(updater, server)
+    return server
+
+
+def register(bot):
+    """
+    Ask Telegram to deliver the updates through the webhook,
+    along with the secret token (if any) that it must send back.
+
+    The request is made by hand, since 'Bot.setWebhook' (as of
+    python-telegram-bot 5.3) can't send a 'secret_token' at all.
+
+    >>> register(updater.bot)
+    {'ok': True, 'result': True, 'description': 'Webhook was set'}
+    """
+
+    fields = {'url': get_webhook_url()}
+    if WEBHOOK_TOKEN:
+        fields['secret_token'] = WEBHOOK_TOKEN
+    request = Request('{}/setWebhook'.format(bot.base_url),
+                      data=json.dumps(fields).encode('utf-8'),
+                      headers={'Content-Type': 'application/json'})
+
+    # NOTE: a rejected request (e.g. a malformed token) raises an error,
+    # ===== instead of leaving Bilbot deaf to every update.
+    with urlopen(request) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def shutdown(updater, server):
+    """
+    Shut down both the listener and the dispatcher.
+    """
+
+    server.shutdown()
+    updater.dispatcher.stop()
+    updater.running = False
+
+
+# REPLAYING
+# =========
+
+def replay(filepath, port=WEBHOOK_PORT):
+    """
+    POST every recorded update of a file to a local listener.
+
+    >>> replay('updates.jsonl')
+    200 update 314225
+    200 update 314226
+    """
+
+    url = 'http://127.0.0.1:{}/{}'.format(port, WEBHOOK_SECRET)
+    headers = {'Content-Type': 'application/json'}
+    if WEBHOOK_TOKEN:
+        headers[TOKEN_HEADER] = WEBHOOK_TOKEN
+
+    with open(filepath) as updates:
+        for line in filter(str.strip, updates):
+            request = Request(url, data=line.encode('utf-8'), headers=headers)
+            with urlopen(request) as response:
+                update_id = json.loads(line).get('update_id')
+                print(response.status, 'update', update_id)
+
+
+if __name__ == '__main__':
+    replay(*sys.argv[1:])
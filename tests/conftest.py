@@ -0,0 +1,20 @@
+"""
+This module prepares the environment of Bilbot's tests.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+import sys
+import tempfile
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# NOTE: this must be done before any module of Bilbot is imported,
+# ===== since their settings are read at import time.
+os.environ['BILBOT_CONFIG'] = os.path.join(TESTS_DIR, 'bilbot.cfg')
+os.environ['OPENSHIFT_DATA_DIR'] = tempfile.mkdtemp()
+os.environ['OPENSHIFT_LOG_DIR'] = os.environ['OPENSHIFT_DATA_DIR']
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'bilbot'))
@@ -0,0 +1,45 @@
+"""
+Tests for Bilbot's binary ledger.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from binledger import NameTable
+
+
+class NameTableTest(unittest.TestCase):
+    """
+    Two name tables over the same side table (as if they were
+    in different processes) must never hand out the same index
+    for different names.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        filepath = os.path.join(self.directory, 'accounts-42.names')
+        self.names = NameTable(filepath)
+        self.other_names = NameTable(filepath)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_indexes_are_shared(self):
+        self.assertEqual(self.names.intern('Bob'), 0)
+        self.assertEqual(self.other_names.intern('Alice'), 1)
+        self.assertEqual(self.other_names.intern('Bob'), 0)
+        self.assertEqual(self.names.intern('Alice'), 1)
+
+    def test_unknown_index_is_read(self):
+        self.other_names.intern('Bob')
+        self.assertEqual(self.names[0], 'Bob')
+
+
+if __name__ == '__main__':
+    unittest.main()
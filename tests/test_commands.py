@@ -0,0 +1,167 @@
+"""
+Tests for Bilbot's commands.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import commands
+import csvledger
+import settings
+from messages import ERROR, INFO
+
+PAGE_SIZE = 3
+
+# pylint: disable=protected-access
+
+
+class FakeUpdate:
+    """
+    Keep every reply instead of sending it.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.replies = []
+
+    def reply(self, message):
+        self.replies.append(message)
+
+
+class CommandTest(unittest.TestCase):
+    """
+    Prepare a ledger with seven withdrawals in the first period,
+    and pages of three withdrawals each.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        filepath = os.path.join(self.directory, 'accounts-42.txt')
+        self.ledger = csvledger.CSVLedger(filepath)
+        self.ledger.open_period('1')
+        for number in range(7):
+            self.ledger.withdraw('1', 7, 'Alice', 1000 + number)
+        self.update = FakeUpdate(self.ledger)
+
+        snapshot = settings.get_snapshot()._replace(list_page_size=PAGE_SIZE)
+        patcher = mock.patch.object(settings, 'get_snapshot',
+                                    return_value=snapshot)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _get_listed(self):
+        return [reply for reply in self.update.replies
+                if reply.startswith('Alice')]
+
+
+class ListPageTest(CommandTest):
+    """
+    '/list' must show only the requested page,
+    along with the total of the whole period.
+    """
+
+    def test_page_is_parsed(self):
+        self.assertEqual(commands._get_page([]), 1)
+        self.assertEqual(commands._get_page(['page', '3']), 3)
+        self.assertIsNone(commands._get_page(['page', '0']))
+        self.assertIsNone(commands._get_page(['page', 'two']))
+
+    def test_first_page(self):
+        self.assertTrue(commands._reply_page(self.update, '1', 1, '/list'))
+        self.assertEqual(self._get_listed(),
+                         [INFO.EACH_LIST.format(user='Alice', amount=amount)
+                          for amount in ('1.000', '1.001', '1.002')])
+        self.assertIn(INFO.POST_LIST.format(amount='7.021'),
+                      self.update.replies)
+        self.assertIn(INFO.LIST_PAGE.format(page=1, pages=3),
+                      self.update.replies)
+        self.assertIn(INFO.NEXT_PAGE.format(command='/list', page=2),
+                      self.update.replies)
+
+    def test_last_page(self):
+        self.assertTrue(commands._reply_page(self.update, '1', 3, '/list'))
+        self.assertEqual(self._get_listed(),
+                         [INFO.EACH_LIST.format(user='Alice', amount='1.006')])
+        self.assertIn(INFO.POST_LIST.format(amount='7.021'),
+                      self.update.replies)
+        self.assertEqual(self.update.replies[-1],
+                         INFO.LIST_PAGE.format(page=3, pages=3))
+
+    def test_missing_page(self):
+        self.assertFalse(commands._reply_page(self.update, '1', 4, '/list'))
+        self.assertEqual(self.update.replies,
+                         [ERROR.WRONG_PAGE.format(page=4)])
+
+
+class HistoryTest(CommandTest):
+    """
+    '/history' must sum up every period within a range,
+    and '/list <ppid>' must show a past one.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.ledger.open_period('2')
+        self.ledger.withdraw('2', 8, 'Bob', 2000)
+        self.ledger.open_period('3')
+        self.ledger.withdraw('3', 7, 'Alice', 500)
+
+    def test_range_is_parsed(self):
+        self.assertEqual(commands._get_range([]), (0, float('inf')))
+        self.assertEqual(commands._get_range(['1', '2']), (1, 2))
+        self.assertIsNone(commands._get_range(['2', '1']))
+        self.assertIsNone(commands._get_range(['1', '2', '3']))
+
+    def test_period_is_parsed(self):
+        self.assertEqual(commands._parse_period(['1', 'page', '2'], '3'),
+                         ('1', '/list 1', ['page', '2']))
+        self.assertEqual(commands._parse_period(['0'], '3'),
+                         ('', '/list 0', []))
+        self.assertEqual(commands._parse_period(['agg'], '3'),
+                         ('3', '/list', ['agg']))
+
+    def test_range_totals(self):
+        commands._reply_history(self.update, ['1', '2'])
+        replies = self.update.replies
+        self.assertIn(INFO.EACH_HISTORY.format(ppid=1, amount='7.021'),
+                      replies)
+        self.assertIn(INFO.EACH_HISTORY.format(ppid=2, amount='2.000'),
+                      replies)
+        self.assertNotIn(INFO.EACH_HISTORY.format(ppid=3, amount='500'),
+                         replies)
+        post_history = INFO.POST_HISTORY.format(amount='9.021')
+        self.assertIn(post_history, replies)
+        self.assertCountEqual(
+            replies[replies.index(post_history) + 1:],
+            [INFO.EACH_LIST.format(user='Alice', amount='7.021'),
+             INFO.EACH_LIST.format(user='Bob', amount='2.000')])
+
+    def test_empty_or_long_range(self):
+        commands._reply_history(self.update, [])
+        commands._reply_history(self.update,
+                                ['1'] * (commands.HISTORY_LENGTH + 1))
+        self.assertEqual(self.update.replies,
+                         [ERROR.EMPTY_HISTORY,
+                          ERROR.LONG_HISTORY.format(
+                              limit=commands.HISTORY_LENGTH)])
+
+    def test_past_period_is_listed(self):
+        self.assertTrue(commands._reply_page(self.update, '1', 1, '/list 1'))
+        self.assertIn(INFO.POST_LIST.format(amount='7.021'),
+                      self.update.replies)
+        self.assertIn(INFO.NEXT_PAGE.format(command='/list 1', page=2),
+                      self.update.replies)
+
+
+if __name__ == '__main__':
+    unittest.main()
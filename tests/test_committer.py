@@ -0,0 +1,80 @@
+"""
+Tests for Bilbot's group committer.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from committer import GroupCommitter
+
+APPENDS = 8
+
+
+class GroupCommitTest(unittest.TestCase):
+    """
+    The appends that queue up while a commit is underway
+    must be written together, and a lone one must not wait.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'accounts-42.txt')
+        self.batches = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _get_committer(self, window):
+        return GroupCommitter(self.filepath, window,
+                              on_commit=lambda batch:
+                              self.batches.append(len(batch)))
+
+    def test_concurrent_appends_are_batched(self):
+        committer = self._get_committer(window=0.05)
+        offsets = []
+
+        def append(number):
+            data = '{}\n'.format(number).encode()
+            offsets.append(committer.append(data))
+
+        threads = [threading.Thread(target=append, args=(number,))
+                   for number in range(APPENDS)]
+
+        # NOTE: the first append is collected at once, and then waits
+        # ===== for the lock, while every other one is queued behind it.
+        with committer.lock:
+            for thread in threads:
+                thread.start()
+            deadline = time.monotonic() + 5
+            while committer.requests.qsize() < APPENDS - 1:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.batches, [1, APPENDS - 1])
+        self.assertEqual(sorted(offsets), [2 * number
+                                           for number in range(APPENDS)])
+        with open(self.filepath, 'rb') as ledger:
+            self.assertEqual(sorted(ledger.read().split()),
+                             [str(number).encode()
+                              for number in range(APPENDS)])
+
+    def test_lone_append_does_not_wait(self):
+        committer = self._get_committer(window=10)
+        start = time.monotonic()
+        self.assertEqual(committer.append(b'1\n'), 0)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(self.batches, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Tests for Bilbot's plain-text ledger.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import csvledger
+
+# NOTE: this replaces Alice's withdrawal with another one
+# ===== just as long, so the size of the ledger is left as it was.
+REWRITE = """
+import sys
+sys.path.insert(0, {bilbot_dir!r})
+import csvledger
+ledger = csvledger.CSVLedger({filepath!r})
+ledger.rollback()
+ledger.withdraw('2', 8, 'Carol', 900)
+"""
+
+
+class OtherProcessTest(unittest.TestCase):
+    """
+    A ledger must notice whatever another process has changed,
+    even if its size is left as it was.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'accounts-42.txt')
+        self.ledger = csvledger.CSVLedger(self.filepath)
+        self.ledger.open_period('2')
+        self.ledger.withdraw('2', 7, 'Alice', 500)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rewrite_is_noticed(self):
+        self.assertEqual(self.ledger.total_period('2'), 500)
+        size = os.path.getsize(self.filepath)
+
+        bilbot_dir = os.path.dirname(os.path.abspath(csvledger.__file__))
+        script = REWRITE.format(bilbot_dir=bilbot_dir, filepath=self.filepath)
+        subprocess.run([sys.executable, '-c', script], check=True)
+
+        self.assertEqual(os.path.getsize(self.filepath), size)
+        self.assertEqual(self.ledger.total_period('2'), 900)
+        self.assertEqual(self.ledger.get_last_record().name, 'Carol')
+        self.assertEqual([record_.name
+                          for record_ in self.ledger.list_period('2')],
+                         ['Carol'])
+
+
+if __name__ == '__main__':
+    unittest.main()
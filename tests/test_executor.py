@@ -0,0 +1,80 @@
+"""
+Tests for Bilbot's command executor.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import random
+import threading
+import time
+import unittest
+
+from executor import ChatExecutor
+
+TASKS = 50
+
+
+class ChatExecutorTest(unittest.TestCase):
+    """
+    The tasks of a chat must run in order, one at a time,
+    while those of different chats run in parallel.
+    """
+
+    def setUp(self):
+        self.executor = ChatExecutor(workers=4, depth=16)
+        self.lock = threading.Lock()
+        self.done = threading.Semaphore(0)
+
+    def _wait(self, count):
+        for _ in range(count):
+            self.assertTrue(self.done.acquire(timeout=5))
+
+    def test_chat_order_is_kept(self):
+        runs, running, overlaps = {}, set(), []
+
+        def run_task(chat_id, number):
+            with self.lock:
+                if chat_id in running:
+                    overlaps.append(chat_id)
+                running.add(chat_id)
+            time.sleep(random.random() / 1000)
+            with self.lock:
+                running.remove(chat_id)
+                runs.setdefault(chat_id, []).append(number)
+            self.done.release()
+
+        for number in range(TASKS):
+            for chat_id in (42, 43, 44):
+                self.executor.submit(chat_id, run_task, chat_id, number)
+        self._wait(3 * TASKS)
+        self.assertEqual(overlaps, [])
+        self.assertEqual(runs, {chat_id: list(range(TASKS))
+                                for chat_id in (42, 43, 44)})
+
+    def test_chats_run_in_parallel(self):
+        started, waits = threading.Event(), []
+
+        def wait_for_other():
+            waits.append(started.wait(timeout=5))
+            self.done.release()
+
+        def start():
+            started.set()
+            self.done.release()
+
+        self.executor.submit(42, wait_for_other)
+        self.executor.submit(43, start)
+        self._wait(2)
+        self.assertEqual(waits, [True])
+
+    def test_failing_task_does_not_block_chat(self):
+        with self.assertLogs(level='ERROR'):
+            self.executor.submit(42, lambda: 1 / 0)
+            self.executor.submit(42, self.done.release)
+            self._wait(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
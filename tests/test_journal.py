@@ -0,0 +1,138 @@
+"""
+Tests for Bilbot's write-ahead journal.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import binconvert
+import binledger
+import csvledger
+import csvtail
+from journal import Journal, get_journal_path
+
+ALICE = b'2;314225;Alice;650\n'
+BOB = b'2;631104;Bob;4200\n'
+
+
+class SideBySideTest(unittest.TestCase):
+    """
+    A CSV ledger and a binary ledger of the same chat
+    must never replay each other's journal.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.directory, 'accounts-42.txt')
+        self.binary_path = os.path.join(self.directory, 'accounts-42.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_journals_are_apart(self):
+        self.assertNotEqual(get_journal_path(self.csv_path),
+                            get_journal_path(self.binary_path))
+
+    def test_conversion_survives_reopening(self):
+        csv_ledger = csvledger.CSVLedger(self.csv_path)
+        csv_ledger.open_period('2')
+        csv_ledger.withdraw('2', 7, 'Alice', 500)
+        csv_ledger.withdraw('2', 8, 'Bob', 700)
+        self.assertTrue(os.path.getsize(get_journal_path(self.csv_path)))
+
+        binconvert.to_binary(self.csv_path, self.binary_path)
+        binary_ledger = binledger.BinaryLedger(self.binary_path)
+        self.assertEqual(binary_ledger.get_ppids(), ['2'])
+        self.assertEqual(binary_ledger.total_period('2'), 1200)
+
+        binary_ledger.withdraw('2', 9, 'Eve', 900)
+        csvtail.forget(self.csv_path)
+        reopened = csvledger.CSVLedger(self.csv_path)
+        self.assertEqual(reopened.total_period('2'), 1200)
+        self.assertEqual(binledger.BinaryLedger(self.binary_path)
+                         .total_period('2'), 2100)
+
+
+class ReplayTest(unittest.TestCase):
+    """
+    Replaying a journal must redo every complete entry that never
+    reached the ledger, and nothing beyond a torn or corrupted one.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'accounts-42.txt')
+        self.journal = Journal(self.filepath)
+        with open(self.filepath, 'wb') as ledger:
+            ledger.write(b'2\n')
+        with open(self.filepath, 'rb+') as ledger:
+            ledger.seek(0, os.SEEK_END)
+            self.journal.append(ledger, 2, ALICE)
+            self.journal.append(ledger, 2 + len(ALICE), BOB)
+
+    def tearDown(self):
+        self.journal.journal_file.close()
+        shutil.rmtree(self.directory)
+
+    def _lose(self, size):
+        # the ledger loses what the page cache held (e.g. on power loss).
+        with open(self.filepath, 'rb+') as ledger:
+            ledger.truncate(size)
+
+    def _read(self):
+        with open(self.filepath, 'rb') as ledger:
+            return ledger.read()
+
+    def _damage_journal(self, function):
+        journal_path = get_journal_path(self.filepath)
+        with open(journal_path, 'rb') as journal_file:
+            data = journal_file.read()
+        with open(journal_path, 'wb') as journal_file:
+            journal_file.write(function(data))
+
+    def test_lost_append_is_redone(self):
+        self._lose(2 + len(ALICE))
+        self.assertEqual(Journal(self.filepath).replay(), 2)
+        self.assertEqual(self._read(), b'2\n' + ALICE + BOB)
+
+    def test_applied_entries_are_left_alone(self):
+        self.assertEqual(Journal(self.filepath).replay(), 0)
+        self.assertEqual(self._read(), b'2\n' + ALICE + BOB)
+
+    def test_truncation_is_redone(self):
+        with open(self.filepath, 'rb+') as ledger:
+            self.journal.truncate(ledger, 2 + len(ALICE))
+        self._lose(2)
+        self.assertEqual(Journal(self.filepath).replay(), 3)
+        self.assertEqual(self._read(), b'2\n' + ALICE)
+
+    def test_torn_entry_is_discarded(self):
+        self._damage_journal(lambda data: data[:-5])
+        self._lose(2)
+        self.assertEqual(Journal(self.filepath).replay(), 1)
+        self.assertEqual(self._read(), b'2\n' + ALICE)
+
+    def test_corrupted_entry_is_discarded(self):
+        self._damage_journal(lambda data: data[:-2] + b'X\n')
+        self._lose(2)
+        self.assertEqual(Journal(self.filepath).replay(), 1)
+        self.assertEqual(self._read(), b'2\n' + ALICE)
+
+    def test_checkpoint_empties_the_journal(self):
+        with open(self.filepath, 'rb+') as ledger:
+            self.journal.checkpoint(ledger)
+        self.assertEqual(os.path.getsize(get_journal_path(self.filepath)), 0)
+
+        self._lose(2)
+        self.assertEqual(Journal(self.filepath).replay(), 0)
+        self.assertEqual(self._read(), b'2\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+"""
+Tests for Bilbot's ledger interface.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import unittest
+
+from ledger import Ledger
+
+
+class InterfaceTest(unittest.TestCase):
+    """
+    A backend must provide every operation of a ledger
+    before it can be created at all.
+    """
+
+    def test_incomplete_backend_is_rejected(self):
+        class HalfLedger(Ledger):
+            def is_empty(self):
+                return True
+
+        with self.assertRaises(TypeError):
+            HalfLedger()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Tests for Bilbot's logging pipeline.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import atexit
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import logpipe
+
+
+class QueuedExceptionTest(unittest.TestCase):
+    """
+    A record logged along with its traceback must reach the file
+    as a single JSON line, with the traceback in its own field.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'bilbot.log')
+        self.root = logging.getLogger()
+        self.handlers, self.level = self.root.handlers[:], self.root.level
+        self.listener = logpipe.start(self.filename, 'json', None,
+                                      '%d/%b %H:%M:%S')
+
+    def tearDown(self):
+        # NOTE: the test itself stops the listener, flushing the queue.
+        atexit.unregister(self.listener.stop)
+        for handler in self.listener.handlers:
+            handler.close()
+        self.root.handlers[:] = self.handlers
+        self.root.setLevel(self.level)
+        shutil.rmtree(self.directory)
+
+    def test_exception_is_kept_apart(self):
+        try:
+            raise ValueError('two hundred pesos')
+        except ValueError:
+            logging.error("%s failed.", '/withdraw', exc_info=True)
+        self.listener.stop()
+
+        with open(self.filename, encoding='utf-8') as log_file:
+            lines = log_file.read().splitlines()
+        self.assertEqual(len(lines), 1)
+        entry = json.loads(lines[0])
+        self.assertEqual(entry['message'], '/withdraw failed.')
+        self.assertIn('ValueError: two hundred pesos', entry['exception'])
+
+
+if __name__ == '__main__':
+    unittest.main()
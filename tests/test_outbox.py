@@ -0,0 +1,89 @@
+"""
+Tests for Bilbot's outbound message scheduler.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import unittest
+
+from outbox import MESSAGE_LIMIT, Outbox, chunk
+
+
+class FakeBot:
+    """
+    Record every message instead of sending it.
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    # pylint: disable=invalid-name
+    def sendMessage(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text, kwargs))
+
+
+class ChunkTest(unittest.TestCase):
+    """
+    A text must be split into messages of at most 4096 characters,
+    on line boundaries whenever it's possible.
+    """
+
+    def test_short_text_is_kept(self):
+        self.assertEqual(chunk('seis\nsiete'), ['seis\nsiete'])
+
+    def test_lines_are_kept_whole(self):
+        line = 'a' * 2000
+        self.assertEqual(chunk('\n'.join([line] * 3)),
+                         ['{0}\n{0}'.format(line), line])
+
+    def test_long_line_is_cut(self):
+        pieces = chunk('b' * (MESSAGE_LIMIT + 10))
+        self.assertEqual([len(piece) for piece in pieces], [MESSAGE_LIMIT, 10])
+
+    def test_limit_is_reached_exactly(self):
+        text = '{}\n{}'.format('c' * 96, 'd' * (MESSAGE_LIMIT - 97))
+        self.assertEqual(chunk(text), [text])
+
+
+class CoalesceTest(unittest.TestCase):
+    """
+    Consecutive texts for the same chat must be merged into one message,
+    unless they are sent differently or they wouldn't fit together.
+    """
+
+    def setUp(self):
+        self.bot = FakeBot()
+        self.outbox = Outbox()
+
+    def _put(self, *texts, **kwargs):
+        # NOTE: holding the condition keeps the sender from taking
+        # ===== any text before every one of them is queued.
+        with self.outbox.condition:
+            for chat_id, text in texts:
+                self.outbox.put(self.bot, chat_id, text, **kwargs)
+        self.assertTrue(self.outbox.flush(timeout=5))
+
+    def test_texts_are_merged(self):
+        self._put((42, 'seis'), (42, 'siete'), (43, 'ocho'))
+        self.assertEqual(self.bot.messages, [(42, 'seis\nsiete', {}),
+                                             (43, 'ocho', {})])
+
+    def test_merged_text_fits(self):
+        self._put((42, 'e' * 3000), (42, 'f' * 2000))
+        self.assertEqual([text for _, text, _ in self.bot.messages],
+                         ['e' * 3000, 'f' * 2000])
+
+    def test_options_are_kept_apart(self):
+        with self.outbox.condition:
+            self.outbox.put(self.bot, 42, 'seis')
+            self.outbox.put(self.bot, 42, '*siete*', parse_mode='Markdown')
+        self.assertTrue(self.outbox.flush(timeout=5))
+        self.assertEqual(self.bot.messages,
+                         [(42, 'seis', {}),
+                          (42, '*siete*', {'parse_mode': 'Markdown'})])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Tests for Bilbot's command router.
+
+Copyright (c) 2016, Nebil Kawas García
+This source code is subject to the terms of the Mozilla Public License.
+You can obtain a copy of the MPL at <https://www.mozilla.org/MPL/2.0/>.
+"""
+
+import unittest
+from types import SimpleNamespace
+
+from executor import ChatExecutor
+from router import CommandRouter, parse
+
+
+class ParseTest(unittest.TestCase):
+    """
+    A command must be split into its name, its mention and its arguments.
+    """
+
+    def test_plain_command(self):
+        self.assertEqual(parse('/about'), ('about', None, []))
+
+    def test_mention_and_arguments(self):
+        self.assertEqual(parse('/list@nebilbot page 2'),
+                         ('list', 'nebilbot', ['page', '2']))
+
+    def test_extra_whitespace(self):
+        self.assertEqual(parse('/history   3  5 '),
+                         ('history', None, ['3', '5']))
+
+
+class RouteTest(unittest.TestCase):
+    """
+    A command must reach its own callback (with its arguments, if it
+    takes any), an unknown one must reach the fallback, and a command
+    meant for another bot must be ignored.
+    """
+
+    def setUp(self):
+        self.calls = []
+        commands = {
+            'about': lambda bot, update: self.calls.append('about'),
+            'list': lambda bot, update, args: self.calls.append(args),
+        }
+        fallback = lambda bot, update: self.calls.append('unknown')
+        self.router = CommandRouter(commands, fallback,
+                                    ChatExecutor(workers=0, depth=1))
+        bot = SimpleNamespace(username='NebilBot')
+        self.dispatcher = SimpleNamespace(bot=bot)
+
+    def _route(self, text):
+        message = SimpleNamespace(text=text, chat_id=42)
+        update = SimpleNamespace(message=message)
+        if self.router.check_update(update):
+            self.router.handle_update(update, self.dispatcher)
+        return update
+
+    def test_command_is_routed(self):
+        self._route('/about')
+        self._route('/list page 2')
+        self.assertEqual(self.calls, ['about', ['page', '2']])
+
+    def test_own_mention_is_routed(self):
+        self._route('/about@nebilbot')
+        self.assertEqual(self.calls, ['about'])
+
+    def test_other_mention_is_ignored(self):
+        update = self._route('/about@otherbot')
+        self._route('/unheard@otherbot')
+        self.assertEqual(self.calls, [])
+        self.assertFalse(hasattr(update, 'routed'))
+
+    def test_unknown_command_falls_back(self):
+        self._route('/unheard')
+        self._route('/unheard@nebilbot 1 2')
+        self.assertEqual(self.calls, ['unknown', 'unknown'])
+
+    def test_plain_text_is_not_checked(self):
+        self._route('hola')
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()